@@ -1,73 +1,139 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, flash, send_file
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+import hashlib
 import secrets
+import tempfile
+import threading
+import time
 import os
-from supabase import create_client, Client
+import sys
+from excel import find_student, roster
+from jobs import DONE, JobQueue, SQLiteBackend
+from tokens import SIGNING_KEY_ENV, signing_configured, verify_token
+from scoreboard import Snapshot, SnapshotCache, fetch_snapshot, payload_digest, save_snapshot, snapshot_delta
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
-ADMIN_PASSWORD_HASH = generate_password_hash('admin0000')
+# hash كلمة السر الافتراضية admin0000 محسوب مسبقاً - pbkdf2 بـ 600 ألف دورة يكلّف ~0.3ث عند كل تشغيل بارد
+ADMIN_PASSWORD_HASH = ('pbkdf2:sha256:600000$mE97POiW7e0F2TUH$'
+                       'f4a930ef1478fb36b9864dbb7aa90994e88d13e0896ab2fa3d3da80f1776edae')
 
 # ========== إعداد Supabase ==========
 SUPABASE_URL = "https://lgpepojvzrgxmnzslvdc.supabase.co"
 SUPABASE_KEY = "sb_publishable_7OCn_h7exZqDAr3ldlc3hQ_mWWUjxoU"
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# العميل ومكتبة supabase يُحمّلان عند أول وصول للبيانات فقط، فالصفحات الثابتة لا تدفع ثمنهما
+_supabase = None
+_supabase_lock = threading.Lock()
+# اتصال HTTP المشترك لكل طلبات Supabase (keep-alive + HTTP/2 + مهلات) وعداداته - انظر transport.py
+_http_transport = None
+
+def get_supabase():
+    """عميل Supabase المشترك للعملية - يُنشأ عند أول استخدام"""
+    global _supabase, _http_transport
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import ClientOptions, create_client
+                from transport import create_http_client, create_transport
+                _http_transport = create_transport()
+                _supabase = create_client(SUPABASE_URL, SUPABASE_KEY,
+                                          options=ClientOptions(httpx_client=create_http_client(_http_transport)))
+    return _supabase
+
+# بدون مفتاح توقيع مشترك بين النسخ لا تُصدر شهادات ولا يُتحقق من رموزها - التحذير عند التشغيل وليس عند أول طالب
+if not signing_configured():
+    print(f"⚠️ {SIGNING_KEY_ENV} غير مضبوط - إصدار الشهادات والتحقق منها معطل", file=sys.stderr)
+
+# كاش اللقطة أمام Supabase - المدة بالثواني قابلة للضبط من البيئة، وآخر لقطة ناجحة تُحفظ على القرص
+# لتُعرض فوراً للمشاهدين عند التشغيل البارد أو تعطل Supabase (خارج المستودع حتى لا يُكتب فوق ملف متتبَّع)
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH',
+                               os.path.join(tempfile.gettempdir(), 'qr-scoreboard-snapshot.json'))
+# نسخة جديدة على Vercel تبدأ بمجلد مؤقت فارغ، فتُعرض static/data.json (للقراءة فقط) حتى أول جلب ناجح
+SNAPSHOT_SEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data.json')
+snapshot_cache = SnapshotCache(lambda: fetch_snapshot(get_supabase()),
+                               ttl=float(os.environ.get('SNAPSHOT_CACHE_TTL', '5')),
+                               path=SNAPSHOT_PATH,
+                               history=int(os.environ.get('SNAPSHOT_HISTORY', '32')),
+                               seed=SNAPSHOT_SEED)
+
+# موعد الانتهاء ثابت طوال عمر العملية حتى يبقى الـ ETag ثابتاً بين الطلبات
+END_TIME = datetime.now() + timedelta(hours=2, minutes=30)
+
+# نبضة إبقاء الاتصال لقناة البث بالثواني
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', '15'))
+# كل قناة بث تشغل خيط عامل طوال عمرها، فتُغلق بعد هذه المدة ويعيد المتصفح الاتصال (retry)
+# - يلزم عامل بخيوط (gunicorn --worker-class gthread --threads N كما في netlify.toml)
+STREAM_MAX_AGE = float(os.environ.get('STREAM_MAX_AGE', '300'))
+
+# جسم /api/data المسلسل لآخر إصدار: (version, body, etag)
+_api_payload = (None, None, None)
+# أجسام الفرق لآخر إصدار لكل since: (version, {since: body})
+_delta_payloads = (None, {})
+
+# أجسام /api/leaderboard لآخر إصدار لكل limit: (version, {limit: (body, etag)})
+_leaderboard_payloads = (None, {})
+LEADERBOARD_DEFAULT = 6
+LEADERBOARD_MAX = 500
+
+# بصمة آخر حفظ ناجح وعدادات الحفظ المطبق/المتجاهل
+_last_save_digest = None
+save_stats = {"applied": 0, "skipped": 0}
+# حفظ واحد في كل مرة: حفظان متداخلان يقرآن نفس اللقطة فيُدرج الفريق الجديد (بدون id) مرتين
+_save_lock = threading.Lock()
+
+def certificate_path(name):
+    # reportlab وPyPDF2 ثقيلة فتُستورد مع أول شهادة فقط
+    from certificate import certificate_path
+    return certificate_path(name)
+
+# طابور إنشاء الشهادات - CERT_JOBS_DB يفعّل تخزين الحالة في SQLite بدلاً من الذاكرة
+_jobs_db = os.environ.get('CERT_JOBS_DB')
+certificate_jobs = JobQueue(certificate_path,
+                            backend=SQLiteBackend(_jobs_db) if _jobs_db else None,
+                            workers=int(os.environ.get('CERT_JOB_WORKERS', '2')))
 
 # ========== دوال التعامل مع Supabase ==========
 def get_data_from_supabase():
-    """جلب البيانات من جداول Supabase"""
-    try:
-        teams_response = supabase.table('teams').select('*').execute()
-        teams = teams_response.data
-        
-        mvp_response = supabase.table('mvp').select('*').limit(1).execute()
-        mvp = mvp_response.data[0] if mvp_response.data else {"name": "", "team": "", "score": 0}
-        
-        news_response = supabase.table('news_items').select('text').order('created_at', desc=False).execute()
-        news_items = [item['text'] for item in news_response.data]
-        
-        return {"teams": teams, "mvp": mvp, "news_items": news_items}
-    except Exception as e:
-        print(f"خطأ في قراءة Supabase: {e}")
-        return {"teams": [], "mvp": {"name": "", "team": "", "score": 0}, "news_items": []}
+    """جلب البيانات من جداول Supabase مباشرة (للوحة التحكم) - الأخطاء تُرفع للمستدعي
+
+    لا تمر بكاش المشاهدين: النسخة القديمة أو نسخة القرص (بدون ids) لو حُفظت من اللوحة
+    تستبدل الفرق الحالية بفرق جديدة.
+    """
+    return fetch_snapshot(get_supabase()).to_dict()
 
 def save_data_to_supabase(data):
-    """حفظ البيانات إلى Supabase - النسخة المحسنة"""
-    try:
-        print("💾 بدء الحفظ...")
-        
-        # حذف البيانات القديمة
-        supabase.table('teams').delete().neq('id', 0).execute()
-        supabase.table('mvp').delete().neq('id', 0).execute()
-        supabase.table('news_items').delete().neq('id', 0).execute()
-        
-        # إدراج الفرق
-        if data.get('teams'):
-            for team in data['teams']:
-                supabase.table('teams').insert(team).execute()
-        
-        # إدراج MVP
-        if data.get('mvp'):
-            supabase.table('mvp').insert(data['mvp']).execute()
-        
-        # إدراج الأخبار
-        if data.get('news_items'):
-            for news_text in data['news_items']:
-                supabase.table('news_items').insert({"text": news_text}).execute()
-        
-        print("🎉 الحفظ نجح!")
-        return True
-    except Exception as e:
-        print(f"❌ خطأ في الحفظ: {e}")
-        raise e
+    """حفظ البيانات إلى Supabase - حفظ الفرق فقط مقارنة باللقطة الحالية
+
+    يُرجع None بدون لمس Supabase إذا كان المحتوى مطابقاً لآخر حفظ.
+    """
+    global _last_save_digest
+    digest = payload_digest(data)
+    with _save_lock:
+        if digest == _last_save_digest:
+            save_stats["skipped"] += 1
+            return None
+        try:
+            print("💾 بدء الحفظ...")
+            client = get_supabase()
+            current = fetch_snapshot(client)
+            saved = save_snapshot(client, current, data)
+            _last_save_digest = digest
+            save_stats["applied"] += 1
+            print("🎉 الحفظ نجح!")
+            return saved
+        except Exception as e:
+            print(f"❌ خطأ في الحفظ: {e}")
+            raise e
+        finally:
+            snapshot_cache.invalidate()
 
 def check_and_create_default_data():
-    """التحقق من البيانات الافتراضية - النسخة الآمنة لـ Vercel"""
+    """التحقق من البيانات الافتراضية - النسخة الآمنة لـ Vercel (يُرجع True عند النجاح)"""
     try:
         # فحص سريع - لو مفيش فرق خالص
-        count_response = supabase.table('teams').select('id', count='exact').execute()
+        count_response = get_supabase().table('teams').select('id', count='exact').execute()
         if count_response.count == 0:
             print("⚠️ الجداول فارغة - إنشاء بيانات افتراضية...")
             default_data = {
@@ -85,30 +151,220 @@ def check_and_create_default_data():
             save_data_to_supabase(default_data)
         else:
             print(f"✅ البيانات موجودة ({count_response.count} فريق)")
+        return True
     except Exception as e:
         print(f"خطأ في الفحص: {e}")
+        return False
+
+# ✅ تشغيل الفحص مرة واحدة لكل عملية (g خاص بالطلب الواحد فلا يصلح هنا)
+_data_initialized = False
+_init_lock = threading.Lock()
+# المسارات التي تقرأ أو تكتب بيانات Supabase - باقي الصفحات لا تحتاج الفحص ولا العميل
+_DATA_ENDPOINTS = {'api_data', 'api_leaderboard', 'api_stream', 'admin_panel', 'save_data'}
 
-# ✅ تشغيل الفحص مرة واحدة عند أول طلب (آمن لـ Vercel)
 @app.before_request
 def before_request():
-    if not hasattr(g, 'data_initialized'):
-        check_and_create_default_data()
-        g.data_initialized = True
-
-from flask import g  # ✅ إضافة هذا السطر
+    global _data_initialized
+    if _data_initialized or request.endpoint not in _DATA_ENDPOINTS:
+        return
+    with _init_lock:
+        if not _data_initialized:
+            _data_initialized = check_and_create_default_data()
 
 # ========== Routes ==========
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def get_api_payload(since=None):
+    """تسلسل /api/data مرة واحدة لكل إصدار وحساب ETag قوي من المحتوى
+
+    مع since (إصدار سابق من نفس الـ epoch) يُرجع الفرق فقط إن كان الإصدار ما زال في سجل الكاش،
+    وإلا اللقطة كاملة. الـ ETag دائماً للقطة الكاملة: العميل بعد تطبيق الفرق يملك نفس المحتوى.
+    """
+    global _api_payload, _delta_payloads
+    try:
+        snapshot, version = snapshot_cache.get()
+    except Exception as e:
+        print(f"خطأ في قراءة Supabase: {e}")
+        snapshot, version = Snapshot(), None
+    if version is not None and _api_payload[0] == version:
+        body, etag = _api_payload[1], _api_payload[2]
+    else:
+        data = snapshot.to_dict()
+        data['teams'] = snapshot.ranked
+        data['end_time'] = END_TIME.isoformat()
+        data['news'] = data['news_items']
+        data['version'] = version
+        data['epoch'] = snapshot_cache.epoch
+        body = app.json.dumps(data).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if version is not None:
+            _api_payload = (version, body, etag)
+    if since is None or version is None:
+        return body, etag
+
+    cached_version, deltas = _delta_payloads
+    if cached_version == version and since in deltas:
+        return deltas[since], etag
+    old = snapshot_cache.at(since)
+    delta = snapshot_delta(old, snapshot) if old is not None else None
+    if delta is None:
+        return body, etag
+    delta.update(delta=True, since=since, version=version, epoch=snapshot_cache.epoch)
+    delta_body = app.json.dumps(delta).encode('utf-8')
+    if cached_version != version:
+        deltas = {}
+        _delta_payloads = (version, deltas)
+    deltas[since] = delta_body
+    return delta_body, etag
+
 @app.route('/api/data')
 def api_data():
-    data = get_data_from_supabase()
-    end_time = datetime.now() + timedelta(hours=2, minutes=30)
-    data['end_time'] = end_time.isoformat()
-    data['news'] = data['news_items']
-    return jsonify(data)
+    since = request.args.get('since', type=int)
+    if request.args.get('epoch') != snapshot_cache.epoch:
+        since = None
+    body, etag = get_api_payload(since)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def get_leaderboard_payload(limit):
+    """أول limit فريق بترتيبهم المحسوب مسبقاً - يُسلسل مرة واحدة لكل (إصدار، limit)"""
+    global _leaderboard_payloads
+    try:
+        snapshot, version = snapshot_cache.get()
+    except Exception as e:
+        print(f"خطأ في قراءة Supabase: {e}")
+        snapshot, version = Snapshot(), None
+    cached_version, payloads = _leaderboard_payloads
+    if version is not None and cached_version == version and limit in payloads:
+        return payloads[limit]
+    ranked = snapshot.ranked
+    body = app.json.dumps({"teams": ranked[:limit], "total": len(ranked)}).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    if version is not None:
+        if cached_version != version:
+            payloads = {}
+            _leaderboard_payloads = (version, payloads)
+        payloads[limit] = (body, etag)
+    return body, etag
+
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    limit = request.args.get('limit', LEADERBOARD_DEFAULT, type=int)
+    body, etag = get_leaderboard_payload(max(1, min(limit, LEADERBOARD_MAX)))
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def stream_snapshots(last_etag=None):
+    """بث اللقطة عند كل تغيير - نفس الجسم المسلسل يُرسل لكل المشاهدين
+
+    ينتهي بعد STREAM_MAX_AGE حتى لا يحجز خيطاً للأبد. عند إعادة الاتصال يرسل المتصفح
+    Last-Event-ID فلا تُعاد اللقطة نفسها إن لم تتغير.
+    """
+    deadline = time.monotonic() + STREAM_MAX_AGE
+    yield b'retry: 5000\n\n'
+    while True:
+        body, etag = get_api_payload()
+        if etag != last_etag:
+            last_etag = etag
+            yield b'event: snapshot\nid: "' + etag.encode() + b'"\ndata: ' + body + b'\n\n'
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not snapshot_cache.wait(min(STREAM_HEARTBEAT, remaining)):
+            yield b': ping\n\n'
+
+@app.route('/api/stream')
+def api_stream():
+    last_etag = request.headers.get('Last-Event-ID', '').strip('"') or None
+    response = Response(stream_snapshots(last_etag), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _certificate_cache_stats():
+    from certificate import get_cache
+    return get_cache().stats()
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify({
+        "snapshot_cache": snapshot_cache.stats(),
+        "saves": save_stats,
+        "certificate_cache": _certificate_cache_stats(),
+        "certificate_jobs": certificate_jobs.stats(),
+        "roster": roster.stats(),
+        "supabase_http": _http_transport.stats() if _http_transport else None,
+    })
+
+# ========== الشهادات ==========
+@app.route('/certificate', methods=['GET', 'POST'])
+def certificate_form():
+    if request.method == 'POST':
+        name = request.form.get('name', '')
+        result = find_student(name, request.form.get('national_id', '').strip() or None)
+        if result['status'] == 'accepted':
+            job_id = certificate_jobs.submit(result['name'])
+            return render_template('certificate_ready.html', name=result['name'], job_id=job_id)
+        flash(result['message'], 'error')
+        if result['status'] == 'needs_id':
+            return render_template('form.html', name=name, needs_id=True)
+    return render_template('form.html')
+
+@app.route('/download', methods=['POST'])
+def download_certificate():
+    result = find_student(request.form.get('name', ''), request.form.get('national_id', '').strip() or None)
+    if result['status'] != 'accepted':
+        flash(result['message'], 'error')
+        return redirect(url_for('certificate_form'))
+    try:
+        path = certificate_path(result['name'])
+    except RuntimeError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('certificate_form'))
+    return send_file(path, mimetype='application/pdf',
+                     as_attachment=True, download_name='certificate.pdf')
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = certificate_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "المهمة غير موجودة"}), 404
+    return jsonify({"id": job_id, "status": job['status'], "error": job['error']})
+
+@app.route('/download/<job_id>')
+def download_job(job_id):
+    job = certificate_jobs.get(job_id)
+    if job is None or job['status'] != DONE:
+        return jsonify({"error": "الشهادة غير جاهزة بعد"}), 404
+    # عبر الكاش وليس job['path']: الملف قد يكون حُذف، أو رُسم بمفتاح توقيع أو رابط تحقق تغيّر بعد المهمة
+    try:
+        path = certificate_path(job['name'])
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return send_file(path, mimetype='application/pdf',
+                     as_attachment=True, download_name='certificate.pdf')
+
+@app.route('/verify/<token>')
+def verify_certificate(token):
+    """التحقق من رمز QR الشهادة بالتوقيع وحده - بدون Supabase أو ملف الطلاب"""
+    try:
+        result = verify_token(token)
+    except RuntimeError as e:
+        return jsonify({"valid": None, "error": str(e)}), 503
+    if result is None:
+        return jsonify({"valid": False}), 404
+    issued_at = datetime.fromtimestamp(result['issued_at']).isoformat()
+    response = jsonify({"valid": True, "student_id": result['student_id'], "issued_at": issued_at})
+    # الرمز لا يتغير فتكفي نتيجة واحدة لكل ماسح
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
 
 @app.route('/admin', methods=['GET', 'POST'])
 def admin_login():
@@ -137,7 +393,12 @@ def admin_panel():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    data = get_data_from_supabase()
+    try:
+        data = get_data_from_supabase()
+    except Exception as e:
+        print(f"خطأ في قراءة Supabase: {e}")
+        # بدون بيانات حديثة لا نعرض اللوحة، فأي حفظ منها سيكتب فوق البيانات الحقيقية
+        return f"تعذر الاتصال بـ Supabase، حاول مرة أخرى: {e}", 503
     return render_template('admin_dashboard.html', data=data)
 
 @app.route('/admin/save', methods=['POST'])
@@ -147,8 +408,10 @@ def save_data():
     
     try:
         data = request.json
-        save_data_to_supabase(data)
-        return jsonify({"success": True, "message": "تم الحفظ بنجاح! 🎉"})
+        saved = save_data_to_supabase(data)
+        if saved is None:
+            return jsonify({"success": True, "skipped": True, "message": "لا توجد تغييرات"})
+        return jsonify({"success": True, "message": "تم الحفظ بنجاح! 🎉", "teams": saved.teams})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
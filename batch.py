@@ -0,0 +1,195 @@
+#batch.py
+"""إنشاء شهادات لكل الطلاب دفعة واحدة
+
+    python batch.py students.csv -o certificates.zip --workers 4
+    python batch.py students.csv -o certificates.pdf   # الذاكرة تكبر مع عدد الطلاب (~100KiB/شهادة)
+    python batch.py students.csv --warmup      # كل الشهادات في الكاش قبل الحدث (يكمل من حيث توقف)
+    python batch.py students.csv --verify      # فحص الكاش مقابل القالب الحالي
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+import zipfile
+from multiprocessing import Pool
+
+import certificate
+import tokens
+from excel import normalize_name
+
+
+def read_names(path):
+    """أسماء الطلاب من عمود Name بدون تكرار وبنفس الترتيب"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        names = [row['Name'].strip() for row in csv.DictReader(f) if row.get('Name', '').strip()]
+    seen, unique = set(), []
+    for name in names:
+        key = normalize_name(name)
+        if key not in seen:
+            seen.add(key)
+            unique.append(name)
+    return unique
+
+
+def _init_worker():
+    certificate.get_engine()
+
+
+def _render(item):
+    index, name = item
+    return index, name, certificate.get_engine().render(name)
+
+
+def _render_overlay(item):
+    index, name = item
+    return index, name, certificate.get_engine().render_overlay(name)
+
+
+def _warm(item):
+    index, name = item
+    return index, name, certificate.certificate_path(name)
+
+
+_UNSAFE_RE = re.compile(r'[^\w\- ]+')
+
+
+def _safe_filename(index, name):
+    stem = _UNSAFE_RE.sub('', name).strip().replace(' ', '_')
+    return f"{index + 1:04d}-{stem}.pdf"
+
+
+class _Progress:
+    def __init__(self, total, enabled=True):
+        self.total = total
+        self.done = 0
+        self.enabled = enabled
+        self.start = time.perf_counter()
+
+    def step(self):
+        self.done += 1
+        if self.enabled and (self.done % 10 == 0 or self.done == self.total):
+            rate = self.done / (time.perf_counter() - self.start)
+            sys.stderr.write(f"\r[{self.done}/{self.total}] {rate:6.1f} شهادة/ث")
+            if self.done == self.total:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+
+
+def _results(names, workers, render=_render):
+    """الشهادات بالترتيب - من عدة عمليات إن أمكن، وكل واحدة تُسلّم فور جاهزيتها"""
+    items = list(enumerate(names))
+    if workers <= 1:
+        _init_worker()
+        yield from map(render, items)
+        return
+    with Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap(render, items, chunksize=4)
+
+
+def generate(names, output, workers=os.cpu_count() or 1, progress=True):
+    """كتابة الشهادات إلى ZIP (ملف لكل طالب) أو PDF مدمج حسب امتداد output
+
+    ZIP وحده بذاكرة ثابتة. PDF المدمج يبقى كاملاً في الذاكرة حتى الكتابة (~100KiB لكل شهادة)
+    لأن PyPDF2 لا يكتب جزئياً - للقوائم الكبيرة استخدم ZIP.
+    """
+    tracker = _Progress(len(names), enabled=progress)
+    if output.lower().endswith('.zip'):
+        # PDF مضغوط أصلاً فلا فائدة من ضغط ZIP، وكل ملف يُكتب للقرص فور وصوله
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for index, name, pdf in _results(names, workers):
+                archive.writestr(_safe_filename(index, name), pdf)
+                tracker.step()
+    else:
+        # العمليات ترسم الاسم فقط، والقالب يُكتب مرة واحدة في الملف المدمج
+        writer = certificate.SharedTemplateWriter(certificate.get_engine())
+        for _, _, overlay in _results(names, workers, render=_render_overlay):
+            writer.add(overlay)
+            tracker.step()
+        with open(output, 'wb') as f:
+            writer.write(f)
+    return tracker.done
+
+
+def _cached_path(name):
+    return certificate.get_cache().path(certificate.get_engine().cache_key(name))
+
+
+def warmup(names, workers=os.cpu_count() or 1, progress=True):
+    """رسم كل الشهادات الناقصة في كاش القرص - الموجود يُتخطى فيمكن إعادة التشغيل بعد أي انقطاع"""
+    pending = [name for name in names if not os.path.exists(_cached_path(name))]
+    cache = certificate.get_cache()
+    if pending:
+        # الحجم التقديري من أول شهادة: لو تجاوز الحد سيحذف الكاش شهادات الإحماء نفسها
+        sample = os.path.getsize(certificate.certificate_path(pending[0]))
+        needed = sample * len(names)
+        if needed > cache.max_bytes:
+            print(f"⚠️ الكاش يحتاج ~{needed / 1024 / 1024:.0f}MB والحد {cache.max_bytes / 1024 / 1024:.0f}MB"
+                  f" - زِد CERT_CACHE_MAX_MB", file=sys.stderr)
+    tracker = _Progress(len(pending), enabled=progress)
+    for _ in _results(pending, workers, render=_warm):
+        tracker.step()
+    return len(pending), len(names) - len(pending)
+
+
+def verify(names, remove=True):
+    """فحص شهادة كل اسم في الكاش: موجودة وسليمة ومرسومة بالقالب الحالي
+
+    الملفات التالفة أو القديمة تُحذف (remove=True) حتى يعيد --warmup رسمها.
+    """
+    engine = certificate.get_engine()
+    report = {"ok": 0, "missing": [], "stale": []}
+    for name in names:
+        path = _cached_path(name)
+        if not os.path.exists(path):
+            report["missing"].append(name)
+        elif engine.is_current(path):
+            report["ok"] += 1
+        else:
+            report["stale"].append(name)
+            if remove:
+                os.remove(path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('roster', help="ملف CSV فيه عمود Name")
+    parser.add_argument('-o', '--output', default='certificates.zip', help="ملف .zip (ذاكرة ثابتة) أو .pdf مدمج"
+                        " (يبقى كاملاً في الذاكرة حتى الكتابة: ~100KiB لكل شهادة)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--limit', type=int, help="أول N اسم فقط")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--warmup', action='store_true', help="رسم الشهادات في كاش الخادم بدلاً من ملف إخراج")
+    mode.add_argument('--verify', action='store_true', help="فحص شهادات الكاش مقابل بصمة القالب الحالية")
+    args = parser.parse_args()
+    # --verify يحتاجه أيضاً: بصمة المفتاح جزء من مفتاح الكاش وبيانات الملف
+    if not tokens.signing_configured():
+        parser.error(f"{tokens.SIGNING_KEY_ENV} غير مضبوط - رموز QR لن يمكن التحقق منها")
+
+    names = read_names(args.roster)[:args.limit]
+    if args.verify:
+        report = verify(names)
+        for label in ("missing", "stale"):
+            for name in report[label]:
+                print(f"{label}: {name}")
+        print(f"✅ {report['ok']}/{len(names)} سليمة، {len(report['missing'])} ناقصة،"
+              f" {len(report['stale'])} قديمة/تالفة (حُذفت) → {certificate.get_cache().directory}")
+        sys.exit(0 if report["ok"] == len(names) else 1)
+
+    start = time.perf_counter()
+    if args.warmup:
+        rendered, skipped = warmup(names, workers=args.workers, progress=not args.quiet)
+        elapsed = time.perf_counter() - start
+        print(f"✅ {rendered} شهادة جديدة، {skipped} موجودة مسبقاً، في {elapsed:.1f}ث"
+              f" → {certificate.get_cache().directory}")
+        return
+    count = generate(names, args.output, workers=args.workers, progress=not args.quiet)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count} شهادة في {elapsed:.1f}ث ({count / elapsed:.1f} شهادة/ث) → {args.output}")
+
+
+if __name__ == '__main__':
+    main()
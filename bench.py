@@ -0,0 +1,709 @@
+#bench.py
+"""قياسات أداء محلية - python bench.py <اسم القياس>"""
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import batch
+import certificate
+import excel
+import tokens
+from scoreboard import DEFAULT_MVP, Snapshot, SnapshotCache, fetch_snapshot, save_snapshot
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# ========== بديل محلي لـ Supabase ==========
+class _FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _FakeQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = client.tables[name]
+        self.action = None
+        self.payload = None
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.rows = self.rows[:n]
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = 'insert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows):
+        self.action, self.payload = 'upsert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        self.client.round_trips += 1
+        table = self.client.tables[self.name]
+        if self.action == 'delete':
+            table[:] = [row for row in table if not all(f(row) for f in self.filters)]
+            return _FakeResponse([])
+        if self.action in ('insert', 'upsert'):
+            by_id = {row['id']: row for row in table}
+            written = []
+            for row in self.payload:
+                row = dict(row)
+                if row.get('id') in by_id:
+                    by_id[row['id']].update(row)
+                else:
+                    row.setdefault('id', self.client.next_id())
+                    table.append(row)
+                written.append(row)
+            return _FakeResponse([dict(row) for row in written])
+        return _FakeResponse([dict(row) for row in self.rows], count=len(self.rows))
+
+
+class FakeSupabase:
+    """عميل وهمي يحاكي زمن رحلة الشبكة لكل execute()"""
+
+    def __init__(self, latency=0.02, teams=20, news=10):
+        self.latency = latency
+        self.round_trips = 0
+        self._ids = 1000
+        self.tables = {
+            'teams': [{"id": i + 1, "name": f"فريق {i + 1}", "score": 100 - i, "members": 4, "ideas": 2}
+                      for i in range(teams)],
+            'mvp': [dict(DEFAULT_MVP, id=1)],
+            'news_items': [{"id": i + 1, "text": f"خبر {i + 1}"} for i in range(news)],
+        }
+
+    def next_id(self):
+        self._ids += 1
+        return self._ids
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+# ========== بديل HTTP محلي لـ Supabase (PostgREST) ==========
+def _standin_cert(tmp):
+    """شهادة موقّعة ذاتياً لـ 127.0.0.1 عبر openssl - أو None فيعمل البديل بدون TLS"""
+    cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+    try:
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-keyout', key, '-out', cert, '-subj', '/CN=127.0.0.1',
+                        '-addext', 'subjectAltName=IP:127.0.0.1'], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+def _start_standin(tables, rtt, tmp):
+    """خادم HTTP/1.1 محلي يرد على /rest/v1/<table> بصفوف JSON
+
+    زمن الرحلة rtt يُضاف مرة لكل طلب، ومرتين لكل اتصال جديد (TCP + مصافحة TLS 1.3).
+    يُرجع (base_url, ملف CA أو True, الخادم).
+    """
+    import ssl
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(rtt)
+            table = self.path.split('?')[0].rsplit('/', 1)[-1]
+            body = json.dumps(tables.get(table, []), ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def get_request(self):
+            sock, addr = super().get_request()
+            time.sleep(2 * rtt)
+            return sock, addr
+
+    server = Server(('127.0.0.1', 0), Handler)
+    scheme, verify = 'http', True
+    cert = _standin_cert(tmp)
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*cert)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme, verify = 'https', cert[0]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{scheme}://127.0.0.1:{server.server_address[1]}", verify, server
+
+
+def bench_transport(args):
+    import httpx
+    from supabase import ClientOptions, create_client
+    import transport
+
+    rtt = args.latency / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        base_url, verify, server = _start_standin(FakeSupabase().tables, rtt, tmp)
+        variants = (
+            ("no keep-alive", lambda: transport.MeteredTransport(
+                verify=verify, limits=httpx.Limits(max_keepalive_connections=0)),
+             lambda metered: httpx.Client(transport=metered)),
+            # نفس إعدادات العميل الذي ينشئه postgrest افتراضياً (keepalive_expiry=5s)
+            ("postgrest default", lambda: transport.MeteredTransport(verify=verify, http2=True),
+             lambda metered: httpx.Client(transport=metered, follow_redirects=True)),
+            ("pooled", lambda: transport.create_transport(verify=verify), transport.create_http_client),
+        )
+        for label, make_transport, make_client in variants:
+            metered = make_transport()
+            http = make_client(metered)
+            client = create_client(base_url, 'sb_publishable_bench', options=ClientOptions(httpx_client=http))
+            samples = []
+            for _ in range(args.count):
+                start = time.perf_counter()
+                fetch_snapshot(client)
+                samples.append(time.perf_counter() - start)
+            burst = metered.stats()
+            # تحديثات متباعدة كما يفعل كاش اللقطة: فجوة أطول من keepalive_expiry الافتراضي
+            for _ in range(args.refreshes):
+                time.sleep(args.gap)
+                fetch_snapshot(client)
+            total = metered.stats()
+            p50, p99 = _percentiles(samples)
+            print(f"{label:<18} snapshot p50={p50:7.1f}ms p99={p99:7.1f}ms  "
+                  f"burst reuse={burst['reuse_rate']:.0%} ({burst['tls_handshakes']} TLS)  "
+                  f"idle refreshes: {total['tls_handshakes'] - burst['tls_handshakes']} new TLS"
+                  f" / {args.refreshes * 3} requests")
+            http.close()
+        server.shutdown()
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return statistics.median(samples) * 1000, p99 * 1000
+
+
+def _measure(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+# ========== القياسات ==========
+def _fetch_snapshot_sequential(client):
+    """المسار القديم: ثلاث استعلامات متتالية"""
+    teams = client.table('teams').select('*').execute().data
+    mvp = client.table('mvp').select('*').limit(1).execute().data
+    news = client.table('news_items').select('text').order('created_at', desc=False).execute().data
+    return Snapshot(teams=teams, mvp=mvp[0] if mvp else dict(DEFAULT_MVP),
+                    news_items=[item['text'] for item in news])
+
+
+def bench_snapshot(args):
+    client = FakeSupabase(latency=args.latency / 1000)
+    for label, fn in (("sequential", _fetch_snapshot_sequential), ("concurrent", fetch_snapshot)):
+        p50, p99 = _measure(lambda: fn(client), args.runs)
+        print(f"{label:<12} p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+
+
+class _BlockingCache:
+    """السلوك السابق: الطلب الذي يجد الكاش منتهياً ينتظر Supabase، وعند الفشل يرفع الخطأ"""
+
+    def __init__(self, loader, ttl):
+        self.loader, self.ttl = loader, ttl
+        self._snapshot, self._expires_at = None, 0.0
+
+    def get(self):
+        if time.monotonic() >= self._expires_at:
+            self._snapshot = self.loader()
+            self._expires_at = time.monotonic() + self.ttl
+        return self._snapshot, 0
+
+
+def bench_swr(args):
+    client = FakeSupabase(latency=args.latency / 1000)
+    upstream = {"down": False}
+
+    def loader():
+        if upstream["down"]:
+            time.sleep(args.latency / 1000)
+            raise ConnectionError("upstream down")
+        return fetch_snapshot(client)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.json')
+        # قرص يحمل آخر لقطة ناجحة من تشغيل سابق
+        SnapshotCache(lambda: fetch_snapshot(client), path=path).get()
+        ttl = args.latency / 1000 * 2
+        variants = (("blocking", lambda: _BlockingCache(loader, ttl)),
+                    ("swr + disk", lambda: SnapshotCache(loader, ttl=ttl, path=path)))
+        for label, make in variants:
+            for phase, down in (("healthy", False), ("outage", True)):
+                upstream["down"] = down
+                cache, samples, errors = make(), [], 0
+                # طلب كل 2ms تقريباً لمدة ~ args.runs * 2ms، مع انتهاء الصلاحية عدة مرات
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    try:
+                        cache.get()
+                    except ConnectionError:
+                        errors += 1
+                    samples.append(time.perf_counter() - start)
+                    time.sleep(0.002)
+                p50, p99 = _percentiles(samples)
+                print(f"{label:<11} {phase:<8} get p50={p50:7.3f}ms  p99={p99:7.3f}ms  max={max(samples) * 1000:7.2f}ms"
+                      f"  errors={errors}/{args.runs}")
+
+
+def bench_leaderboard(args):
+    import app
+    app._data_initialized = True
+    client = app.app.test_client()
+    for teams in (20, 1000, 5000):
+        fake = FakeSupabase(latency=0, teams=teams)
+        app.snapshot_cache = SnapshotCache(lambda: fetch_snapshot(fake), ttl=3600)
+        app._api_payload, app._leaderboard_payloads = (None, None, None), (None, {})
+        for label, url in (("/api/data", '/api/data'), ("leaderboard top 6", '/api/leaderboard?limit=6')):
+            size = len(client.get(url).data)
+            p50, _ = _measure(lambda: client.get(url), max(20, args.runs // 4))
+            print(f"teams={teams:<5} {label:<18} {size / 1024:9.1f}KiB/poll  server p50={p50:6.3f}ms")
+
+
+def bench_delta(args):
+    import app
+    app._data_initialized = True
+    client = app.app.test_client()
+    for teams in (20, 1000, 5000):
+        fake = FakeSupabase(latency=0, teams=teams)
+        cache = app.snapshot_cache = SnapshotCache(lambda: fetch_snapshot(fake), ttl=3600)
+        app._api_payload, app._delta_payloads = (None, None, None), (None, {})
+        full = client.get('/api/data').json
+        full_bytes, delta_bytes = [], []
+        for i in range(20):
+            # تعديل نقاط فريق واحد لكل إصدار كما يحدث أثناء الحدث
+            fake.tables['teams'][i * 7 % teams]['score'] += 3
+            version = cache.version
+            cache.invalidate()
+            while cache.version == version:
+                cache.wait(1)
+            full_bytes.append(len(client.get('/api/data').data))
+            response = client.get(f"/api/data?since={full['version']}&epoch={full['epoch']}")
+            delta_bytes.append(len(response.data))
+            full['version'] = response.json['version']
+        print(f"teams={teams:<5} full={statistics.mean(full_bytes) / 1024:8.1f}KiB/poll"
+              f"  delta={statistics.mean(delta_bytes) / 1024:6.2f}KiB/poll"
+              f"  ({statistics.mean(full_bytes) / statistics.mean(delta_bytes):.0f}x)")
+
+
+def _save_delete_all(client, data):
+    """المسار القديم: حذف كل الصفوف ثم إدراج صف صف"""
+    for name in ('teams', 'mvp', 'news_items'):
+        client.table(name).delete().neq('id', 0).execute()
+    for team in data['teams']:
+        client.table('teams').insert(team).execute()
+    client.table('mvp').insert(data['mvp']).execute()
+    for text in data['news_items']:
+        client.table('news_items').insert({"text": text}).execute()
+
+
+def _save_diff(client, data):
+    save_snapshot(client, fetch_snapshot(client), data)
+
+
+def bench_save(args):
+    for label, fn in (("delete-all", _save_delete_all), ("diff", _save_diff)):
+        client = FakeSupabase(latency=args.latency / 1000, teams=50, news=20)
+        data = fetch_snapshot(client).to_dict()
+        data['mvp'] = {k: v for k, v in data['mvp'].items() if k != 'id'}
+        samples = []
+        for i in range(args.runs):
+            data['teams'][0] = dict(data['teams'][0], score=i)
+            client.round_trips = 0
+            start = time.perf_counter()
+            fn(client, data)
+            samples.append(time.perf_counter() - start)
+        p50, p99 = _percentiles(samples)
+        print(f"{label:<12} round_trips={client.round_trips:<4} p50={p50:8.2f}ms  p99={p99:8.2f}ms")
+
+
+def _write_roster(path, names):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Name', 'NationalID', 'Grade'])
+        for i, name in enumerate(names):
+            writer.writerow([name, f"{29900000000000 + i}", 'A'])
+
+
+def _roster_names(size):
+    with open(os.path.join(ROOT, 'students.csv'), encoding='utf-8-sig') as f:
+        names = [row['Name'] for row in csv.DictReader(f)]
+    if size is None:
+        return names
+    return [f"{names[i % len(names)]} {i}" for i in range(size)]
+
+
+def _scan_lookup(path, name, national_id):
+    """المسار القديم: قراءة الملف كاملاً ثم مسح خطي لكل طلب"""
+    rows = excel._read_rows(path)
+    target = name.strip().lower()
+    return next((row for row in rows if row['Name'].strip().lower() == target
+                 and str(row['NationalID']) == str(national_id)), None)
+
+
+def bench_roster(args):
+    for label, size in (("students.csv", None), ("synthetic", 100_000)):
+        names = _roster_names(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'roster.csv')
+            _write_roster(path, names)
+            probes = [(names[i], 29900000000000 + i) for i in range(0, len(names), max(1, len(names) // 50))]
+            roster = excel.Roster(path)
+            start = time.perf_counter()
+            len(roster)
+            load_ms = (time.perf_counter() - start) * 1000
+            scan = _measure(lambda: [_scan_lookup(path, *p) for p in probes[:5]], 3)
+            indexed = _measure(lambda: [roster.lookup(*p) for p in probes], args.runs)
+            print(f"{label:<13} rows={len(names):<7} load={load_ms:8.2f}ms  "
+                  f"scan p50={scan[0] / 5:9.3f}ms/lookup  index p50={indexed[0] / len(probes) * 1000:7.3f}us/lookup")
+
+
+def bench_prefilter(args):
+    names = _roster_names(100_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        source, compiled = os.path.join(tmp, 'roster.csv'), os.path.join(tmp, 'roster.idx')
+        _write_roster(source, names)
+        excel.compile_roster(source, compiled)
+        # أرقام غير مسجلة (خارج نطاق _write_roster) وطلاب مسجلون للتأكد من عدم رفضهم
+        strangers = [(names[i], 10000000000000 + i) for i in range(1000)]
+        members = [(names[i], 29900000000000 + i) for i in range(0, len(names), len(names) // 1000)]
+
+        def unfiltered(index, name, national_id):
+            key, national_id = excel.normalize_name(name), str(national_id)
+            return index.get(key, national_id) or list(index.candidates(national_id))
+
+        for label, path in (("csv+index", source), ("compiled", compiled)):
+            cold = []
+            for check in (lambda r: unfiltered(r._ensure_loaded(), *strangers[0]), lambda r: r.match(*strangers[0])):
+                roster = excel.Roster(path)
+                len(roster)
+                start = time.perf_counter()
+                check(roster)
+                cold.append((time.perf_counter() - start) * 1000)
+            index = roster._ensure_loaded()
+            baseline = _measure(lambda: [unfiltered(index, *q) for q in strangers], 5)
+            filtered = _measure(lambda: [roster.match(*q) for q in strangers], 5)
+            hits = sum(roster.match(*q)[0] is not None for q in members)
+            stats = roster.stats()
+            print(f"{label:<10} first miss: {cold[0]:8.1f}ms → {cold[1]:6.1f}ms   "
+                  f"miss p50: {baseline[0]:6.2f} → {filtered[0]:5.2f}us/lookup   "
+                  f"members {hits}/{len(members)}  rejects={stats['prefilter_rejects']}"
+                  f" passes={stats['prefilter_passes']} hits={stats['confirmed_hits']}")
+
+
+def _misspell(name):
+    """أخطاء كتابة شائعة: صور الهمزة والتاء المربوطة والألف المقصورة وحذف حرف"""
+    swapped = name.translate(str.maketrans({'أ': 'ا', 'إ': 'ا', 'ة': 'ه', 'ي': 'ى'}))
+    return swapped[:-1] if len(swapped) > 6 else swapped
+
+
+def bench_fuzzy(args):
+    roster = excel.Roster(os.path.join(ROOT, 'students.csv'))
+    names = _roster_names(None)
+    len(roster)
+    queries = [_misspell(name) for name in names]
+    found = sum(roster.match(q)[0] is not None for q in queries)
+    p50, p99 = _measure(lambda: [roster.match(q) for q in queries], max(1, args.runs // 20))
+    print(f"queries={len(queries)} matched={found}  per-query p50={p50 / len(queries) * 1000:7.2f}us "
+          f"(batch p99={p99:.1f}ms)")
+    # أسماء بلا أي كلمة مسجلة (نموذج الشهادة) يرفضها المرشح قبل فهرس المقاطع
+    strangers = [f"زائر{i} ضيف{i}" for i in range(len(queries))]
+    unfiltered = _measure(lambda: [roster._ensure_loaded().search(excel.normalize_name(q)) for q in strangers], 3)
+    filtered = _measure(lambda: [roster.match(q) for q in strangers], 3)
+    stats = roster.stats()
+    print(f"strangers={len(strangers)}  per-query p50={unfiltered[0] / len(strangers) * 1000:7.2f}us → "
+          f"{filtered[0] / len(strangers) * 1000:5.2f}us  rejects={stats['prefilter_rejects']}"
+          f" passes={stats['prefilter_passes']} hits={stats['confirmed_hits']}")
+
+
+def _cold_start(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def bench_coldstart(args):
+    paths = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, size in (("students.csv", None), ("synthetic", 100_000)):
+            names = _roster_names(size)
+            source = os.path.join(tmp, f'{label}.csv')
+            _write_roster(source, names)
+            compiled = os.path.join(tmp, f'{label}.idx')
+            excel.compile_roster(source, compiled)
+            probe = (names[len(names) // 2], 29900000000000 + len(names) // 2)
+            paths[label] = (source, compiled, probe)
+        for label, (source, compiled, probe) in paths.items():
+            variants = [
+                ("csv+index", f"import excel; assert excel.Roster({source!r}).lookup(*{probe!r})"),
+                ("compiled", f"import excel; assert excel.Roster({compiled!r}).lookup(*{probe!r})"),
+                # مسار نموذج الشهادة: الاسم وحده
+                ("csv name", f"import excel; assert excel.Roster({source!r}).match({probe[0]!r})[0]"),
+                ("idx name", f"import excel; assert excel.Roster({compiled!r}).match({probe[0]!r})[0]"),
+            ]
+            if importlib.util.find_spec('pandas'):
+                variants.insert(0, ("pandas", f"import pandas as pd; pd.read_csv({source!r})"))
+            for variant, code in variants:
+                p50, p99 = _percentiles([_cold_start(code) for _ in range(max(3, args.runs // 40))])
+                print(f"{label:<13} {variant:<10} cold start p50={p50:8.1f}ms  p99={p99:8.1f}ms")
+
+
+# مكتبات يجب ألا يستوردها app.py عند التشغيل البارد - تُحمّل مع أول طلب يحتاجها
+DEFERRED_IMPORTS = ('supabase', 'httpx', 'pandas', 'reportlab', 'PyPDF2', 'certificate')
+
+
+def _import_profile(module):
+    """(الزمن الكلي بالمللي ثانية، {الاستيرادات المباشرة: زمنها}، كل الوحدات المحمّلة) من -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total, children, loaded = 0.0, {}, set()
+    # الأبناء يُطبعون قبل الأب، فأبناء module هم المستوى الأول بعد آخر وحدة من المستوى الصفري
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        loaded.add(name.strip())
+        if depth == 0:
+            if name.strip() == module:
+                total = int(cumulative) / 1000
+                break
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+    return total, children, loaded
+
+
+def bench_importtime(args):
+    runs = [_import_profile('app') for _ in range(max(3, args.runs // 40))]
+    totals = sorted(total for total, _, _ in runs)
+    median = statistics.median(totals)
+    _, children, loaded = runs[totals.index(median)] if median in totals else runs[0]
+    print(f"import app  p50={median:7.1f}ms  min={totals[0]:7.1f}ms  max={totals[-1]:7.1f}ms")
+    for name, ms in sorted(children.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<24} {ms:7.1f}ms")
+    eager = [name for name in DEFERRED_IMPORTS if name in loaded]
+    failures = []
+    if eager:
+        failures.append(f"مستوردة عند التشغيل: {', '.join(eager)}")
+    if args.budget and median > args.budget:
+        failures.append(f"p50 {median:.1f}ms > الميزانية {args.budget:.0f}ms")
+    if failures:
+        print("❌ " + " | ".join(failures))
+        sys.exit(1)
+    print(f"✅ ضمن الميزانية ({args.budget:.0f}ms) بدون {', '.join(DEFERRED_IMPORTS)}")
+
+
+def _render_uncached(name):
+    """المسار القديم: تحميل القالب وتسجيل الخطوط مع كل شهادة"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    for font, path in certificate.FONTS.items():
+        pdfmetrics.registerFont(TTFont(font, path))
+    return certificate.CertificateEngine().render(name)
+
+
+def bench_certs(args):
+    names = _roster_names(None)[:args.count]
+    engine = certificate.get_engine()
+    for label, render in (("per-cert load", _render_uncached), ("engine", engine.render)):
+        start = time.perf_counter()
+        for name in names:
+            render(name)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14} {len(names) / elapsed:7.1f} certs/s  ({elapsed / len(names) * 1000:.1f}ms/cert)")
+
+
+def bench_batch(args):
+    names = _roster_names(None)[:args.count]
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            batch.generate(names, os.path.join(tmp, f'{workers}.zip'), workers=workers, progress=False)
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:<3} {len(names) / elapsed:7.1f} certs/s")
+
+
+def _merge_full_pages(names, output):
+    """المسار القديم للـ PDF المدمج: نسخة كاملة من القالب في كل صفحة"""
+    import io
+    from PyPDF2 import PdfReader, PdfWriter
+    engine, writer, readers = certificate.get_engine(), PdfWriter(), []
+    for name in names:
+        readers.append(PdfReader(io.BytesIO(engine.render(name))))
+        writer.add_page(readers[-1].pages[0])
+    with open(output, 'wb') as f:
+        writer.write(f)
+
+
+def bench_merged(args):
+    names = _roster_names(None)[:args.count]
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = (
+            ("full pages", _merge_full_pages),
+            ("shared xobject", lambda names, output: batch.generate(names, output, workers=1, progress=False)),
+        )
+        for label, merge in variants:
+            output = os.path.join(tmp, f'{label}.pdf')
+            start = time.perf_counter()
+            merge(names, output)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(output)
+            print(f"{label:<15} {size / 1024 / 1024:8.2f}MiB  {size / len(names) / 1024:8.1f}KiB/cert"
+                  f"  {len(names) / elapsed:6.1f} certs/s")
+
+
+def _shape_uncached(name):
+    """المسار القديم: reshape + bidi + stringWidth لكل شهادة"""
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    from reportlab.pdfbase import pdfmetrics
+    if certificate._ARABIC_RE.search(name):
+        font, text = 'Amiri', get_display(arabic_reshaper.reshape(name))
+    else:
+        font, text = 'beIN', name
+    return pdfmetrics.stringWidth(text, font, 64)
+
+
+def _shape_cached(name):
+    font, text = certificate.shape_text(name)
+    return certificate.text_width(text, font, 64)
+
+
+def bench_shaping(args):
+    certificate.register_fonts()
+    names = _roster_names(None)
+    assert all(abs(_shape_uncached(n) - _shape_cached(n)) < 1e-6 for n in names)
+    certificate.shape_text.cache_clear()
+    certificate.text_width.cache_clear()
+    for label, fn in (("uncached", _shape_uncached), ("memoized cold", _shape_cached),
+                      ("memoized warm", _shape_cached)):
+        start = time.perf_counter()
+        for name in names:
+            fn(name)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14} {elapsed / len(names) * 1e6:8.2f}us/name  ({len(names)} names)")
+
+
+def bench_memory(args):
+    engine = certificate.get_engine()
+    names = _roster_names(None)[:args.count]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = certificate.CertificateCache(tmp)
+        variants = (
+            ("bytes + put", lambda key, name: cache.put(key, engine.render(name))),
+            ("render_to disk", lambda key, name: cache.store(key, lambda f: engine.render_to(f, name))),
+        )
+        for label, store in variants:
+            peaks, start = [], time.perf_counter()
+            for i, name in enumerate(names):
+                tracemalloc.start()
+                store(f"{label}-{i}", name)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            elapsed = (time.perf_counter() - start) / len(names) * 1000
+            print(f"{label:<15} peak={statistics.median(peaks) / 1024:8.1f}KiB/cert  {elapsed:6.1f}ms/cert")
+
+
+def bench_tokens(args):
+    names = _roster_names(None)
+    issued = [tokens.issue_token(name) for name in names]
+    scans = issued * max(1, args.runs * 50 // len(issued))
+    start = time.perf_counter()
+    results = tokens.verify_many(scans)
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    print(f"verify  {len(scans) / elapsed:10,.0f} tokens/s  ({elapsed / len(scans) * 1e6:.2f}us/token,"
+          f" {len(scans)} scans, {tokens.TOKEN_LENGTH} chars)")
+
+
+BENCHMARKS = {
+    'batch': bench_batch,
+    'certs': bench_certs,
+    'coldstart': bench_coldstart,
+    'delta': bench_delta,
+    'fuzzy': bench_fuzzy,
+    'importtime': bench_importtime,
+    'leaderboard': bench_leaderboard,
+    'memory': bench_memory,
+    'prefilter': bench_prefilter,
+    'merged': bench_merged,
+    'roster': bench_roster,
+    'save': bench_save,
+    'shaping': bench_shaping,
+    'snapshot': bench_snapshot,
+    'swr': bench_swr,
+    'transport': bench_transport,
+    'tokens': bench_tokens,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--count', type=int, default=50, help="عدد الشهادات في قياسات PDF")
+    parser.add_argument('--latency', type=float, default=20.0, help="زمن الرحلة الوهمي بالمللي ثانية")
+    parser.add_argument('--gap', type=float, default=6.0, help="الفجوة بين التحديثات المتباعدة بالثواني (transport)")
+    parser.add_argument('--refreshes', type=int, default=2, help="عدد التحديثات المتباعدة (transport)")
+    parser.add_argument('--budget', type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', '400')),
+                        help="أقصى زمن لاستيراد app.py بالمللي ثانية (importtime)")
+    args = parser.parse_args()
+    # مفتاح للقياس فقط (يرثه العمال أيضاً) - الرموز الناتجة لا تصلح لشهادات حقيقية
+    os.environ.setdefault(tokens.SIGNING_KEY_ENV, 'bench-only-signing-key')
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    main()
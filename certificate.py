@@ -0,0 +1,350 @@
+#certificate.py
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from functools import lru_cache
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+import tokens
+from excel import normalize_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(BASE_DIR, 'static', 'certificates', 'template.pdf')
+FONTS = {
+    'Amiri': os.path.join(BASE_DIR, 'fonts', 'Amiri-Bold.ttf'),
+    'beIN': os.path.join(BASE_DIR, 'fonts', 'beIN-Normal.ttf'),
+}
+
+# مكان الاسم على القالب بنقاط PDF (القالب 1920×1080) - أي تعديل هنا يستلزم زيادة LAYOUT_VERSION
+LAYOUT = {
+    "center_x": 840,
+    "baseline_y": 450,
+    "font_size": 64,
+    "min_font_size": 32,
+    "max_width": 1080,
+    "color": (0.09, 0.19, 0.36),
+    # رمز QR الموقّع في المساحة البيضاء أسفل يمين الشهادة
+    "qr_x": 1450,
+    "qr_y": 130,
+    "qr_size": 200,
+}
+LAYOUT_VERSION = 2
+
+# كاش الشهادات على القرص (على Vercel المسار الوحيد القابل للكتابة هو /tmp)
+CACHE_DIR = os.environ.get('CERT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'qr-certificates'))
+CACHE_MAX_BYTES = int(float(os.environ.get('CERT_CACHE_MAX_MB', '512')) * 1024 * 1024)
+
+_ARABIC_RE = re.compile('[؀-ۿ]')
+_fonts_lock = threading.Lock()
+# جداول عرض الحروف المحسوبة مسبقاً لكل خط مسجل: (عرض كل حرف لكل 1000 وحدة، العرض الافتراضي)
+_advances = {}
+
+
+def register_fonts(fonts=FONTS):
+    """تسجيل الخطوط في reportlab مرة واحدة لكل عملية"""
+    with _fonts_lock:
+        registered = set(pdfmetrics.getRegisteredFontNames())
+        for name, path in fonts.items():
+            if name not in registered:
+                pdfmetrics.registerFont(TTFont(name, path))
+            if name not in _advances:
+                face = pdfmetrics.getFont(name).face
+                _advances[name] = (dict(face.charWidths), face.defaultWidth)
+
+
+def file_digest(*paths):
+    """بصمة SHA-256 لمحتوى ملف أو أكثر"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=8192)
+def shape_text(text):
+    """تشكيل الحروف العربية وترتيبها من اليمين لليسار للرسم في PDF (مع حفظ النتائج)"""
+    if _ARABIC_RE.search(text):
+        return 'Amiri', get_display(arabic_reshaper.reshape(text))
+    return 'beIN', text
+
+
+@lru_cache(maxsize=8192)
+def text_width(text, font, size):
+    """عرض النص بالنقاط من جدول عرض الحروف بدلاً من pdfmetrics.stringWidth"""
+    widths, default = _advances[font]
+    return sum(widths.get(ord(ch), default) for ch in text) * size / 1000
+
+
+class CertificateEngine:
+    """محرك الشهادات: القالب والخطوط تُحمّل مرة واحدة، وكل شهادة ترسم الاسم فقط وتدمجه"""
+
+    def __init__(self, template_path=TEMPLATE_PATH, fonts=FONTS, layout=LAYOUT):
+        self.layout = layout
+        register_fonts(fonts)
+        self.template_hash = file_digest(template_path)
+        self.fonts_hash = file_digest(*fonts.values())
+        self._template = PdfReader(template_path).pages[0]
+        self.width = float(self._template.mediabox.width)
+        self.height = float(self._template.mediabox.height)
+
+    def render_overlay(self, name):
+        """PDF صغير فيه الاسم فقط في منتصف مكانه على القالب (بدون القالب)"""
+        layout = self.layout
+        font, text = shape_text(' '.join(name.split()))
+        size = layout["font_size"]
+        width = text_width(text, font, size)
+        if width > layout["max_width"]:
+            size = max(layout["min_font_size"], size * layout["max_width"] / width)
+            width = text_width(text, font, size)
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=(self.width, self.height))
+        pdf.setFillColorRGB(*layout["color"])
+        pdf.setFont(font, size)
+        pdf.drawString(layout["center_x"] - width / 2, layout["baseline_y"], text)
+        self._draw_qr(pdf, tokens.qr_data(tokens.issue_token(name)))
+        pdf.save()
+        return buffer.getvalue()
+
+    def _draw_qr(self, pdf, data):
+        layout = self.layout
+        widget = QrCodeWidget(data, barLevel='M')
+        x0, y0, x1, y1 = widget.getBounds()
+        scale = layout["qr_size"] / max(x1 - x0, y1 - y0)
+        drawing = Drawing(layout["qr_size"], layout["qr_size"], transform=[scale, 0, 0, scale, 0, 0])
+        drawing.add(widget)
+        renderPDF.draw(drawing, pdf, layout["qr_x"], layout["qr_y"])
+
+    def _overlay(self, name):
+        return PdfReader(io.BytesIO(self.render_overlay(name))).pages[0]
+
+    def render_to(self, stream, name):
+        """كتابة الشهادة مباشرة في ملف مفتوح بدون نسخة كاملة في الذاكرة"""
+        page = PageObject.create_blank_page(width=self.width, height=self.height)
+        page.merge_page(self._template)
+        page.merge_page(self._overlay(name))
+        writer = PdfWriter()
+        writer.add_page(page)
+        # بصمة القالب ومفتاح رمز QR داخل الملف نفسه حتى يمكن التحقق من الكاش لاحقاً (batch.py --verify)
+        writer.add_metadata({'/TemplateHash': self.template_hash, '/LayoutVersion': str(LAYOUT_VERSION),
+                             '/SigningKey': tokens.key_fingerprint(), '/VerifyURL': tokens.VERIFY_URL})
+        writer.write(stream)
+
+    def render(self, name):
+        """إنشاء شهادة PDF كاملة للاسم وإرجاعها كـ bytes"""
+        output = io.BytesIO()
+        self.render_to(output, name)
+        return output.getvalue()
+
+    def cache_key(self, name):
+        """مفتاح المحتوى: الاسم الموحد + بصمات القالب والخطوط ومفتاح التوقيع + نسخة التخطيط + رابط التحقق
+
+        رمز QR موقّع بالمفتاح ومسبوق برابط التحقق، فتدوير أيهما يُبطل الشهادات المخزنة.
+        """
+        raw = (f"{normalize_name(name)}|{self.template_hash}|{self.fonts_hash}|{LAYOUT_VERSION}"
+               f"|{tokens.key_fingerprint()}|{tokens.VERIFY_URL}")
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def is_current(self, path):
+        """هل الملف PDF سليم مرسوم بالقالب والتخطيط ومفتاح التوقيع ورابط التحقق الحالية؟"""
+        try:
+            info = PdfReader(path).metadata or {}
+        except Exception:
+            return False
+        return (info.get('/TemplateHash') == self.template_hash
+                and info.get('/LayoutVersion') == str(LAYOUT_VERSION)
+                and info.get('/SigningKey') == tokens.key_fingerprint()
+                and info.get('/VerifyURL', '') == tokens.VERIFY_URL)
+
+
+class SharedTemplateWriter:
+    """PDF مدمج لعدة شهادات: القالب يُخزّن مرة واحدة كـ Form XObject مشترك
+
+    كل صفحة = صفحة الاسم (نص + مجموعة جزئية من الخط) + أمر رسم القالب المشترك،
+    فلا تتكرر صورة القالب مع كل شهادة كما يحدث عند دمج شهادات كاملة.
+    كل الصفحات وقرّاؤها تبقى في الذاكرة حتى write() (PyPDF2 لا يكتب جزئياً)، فالذاكرة تكبر مع العدد.
+    """
+
+    TEMPLATE_NAME = NameObject('/CertTemplate')
+
+    def __init__(self, engine):
+        self.writer = PdfWriter()
+        self._readers = []
+        template = engine._template
+        form = DecodedStreamObject()
+        form.set_data(template.get_contents().get_data())
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(0), FloatObject(0),
+                                              FloatObject(engine.width), FloatObject(engine.height)]),
+            NameObject('/Resources'): template['/Resources'].clone(self.writer),
+        })
+        self._template = self.writer._add_object(form)
+        draw = DecodedStreamObject()
+        draw.set_data(b'q ' + self.TEMPLATE_NAME.encode() + b' Do Q\n')
+        self._draw = self.writer._add_object(draw)
+
+    def add(self, overlay_pdf):
+        """إضافة شهادة من PDF الاسم الناتج عن render_overlay"""
+        reader = PdfReader(io.BytesIO(overlay_pdf))
+        # PyPDF2 يربط الكائنات المنسوخة بـ id(reader)، فلو حُذف القارئ قد يُعاد استخدام نفس id لقارئ آخر
+        self._readers.append(reader)
+        page = self.writer.add_page(reader.pages[0])
+        resources = page[NameObject('/Resources')]
+        xobjects = resources.setdefault(NameObject('/XObject'), DictionaryObject())
+        xobjects[self.TEMPLATE_NAME] = self._template
+        # raw_get يحافظ على المرجع غير المباشر - الـ stream لا يصح وضعه مباشرة داخل مصفوفة
+        contents = page.raw_get(NameObject('/Contents'))
+        if isinstance(contents.get_object(), ArrayObject):
+            contents = contents.get_object()
+        else:
+            contents = [contents]
+        page[NameObject('/Contents')] = ArrayObject([self._draw, *contents])
+        return page
+
+    def write(self, stream):
+        self.writer.write(stream)
+
+
+class CertificateCache:
+    """كاش PDF على القرص بعنوان المحتوى مع حذف الأقدم استخداماً (LRU) عند تجاوز الحجم"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.pdf'):
+                self._sizes[entry.path] = entry.stat().st_size
+        self._total = sum(self._sizes.values())
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        """مسار الملف عند وجوده (مع تحديث وقت الاستخدام) أو None
+
+        ملف لم يكتبه هذا الكاش (batch.py --warmup أو عملية أخرى) يُضاف حجمه عند أول وصول،
+        وملف مُتتبَّع حذفته عملية أخرى يُخصم حجمه، فيبقى حد الحجم صحيحاً بدون إعادة فحص المجلد.
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+            size = os.stat(path).st_size if path not in self._sizes else None
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._total -= self._sizes.pop(path, 0)
+            return None
+        with self._lock:
+            self.hits += 1
+            if size is not None and path not in self._sizes:
+                self._sizes[path] = size
+                self._total += size
+                if self._total > self.max_bytes:
+                    self._evict(keep=path)
+        return path
+
+    def put(self, key, pdf):
+        """تخزين PDF جاهز كـ bytes"""
+        return self.store(key, lambda f: f.write(pdf))
+
+    def store(self, key, write):
+        """write(f) يكتب الملف مباشرة على القرص، ثم استبدال ذري وحذف الأقدم حتى يعود الحجم تحت الحد"""
+        path = self.path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+                size = f.tell()
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        with self._lock:
+            self._total += size - self._sizes.get(path, 0)
+            self._sizes[path] = size
+            if self._total > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep):
+        by_age = sorted(self._sizes, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for old in by_age:
+            if self._total <= self.max_bytes:
+                break
+            if old == keep:
+                continue
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+            self._total -= self._sizes.pop(old)
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "files": len(self._sizes),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+_cache = None
+
+
+def get_engine():
+    """المحرك المشترك للعملية - يُنشأ عند أول شهادة"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = CertificateEngine()
+    return _engine
+
+
+def get_cache():
+    """كاش الشهادات المشترك للعملية"""
+    global _cache
+    if _cache is None:
+        with _engine_lock:
+            if _cache is None:
+                _cache = CertificateCache()
+    return _cache
+
+
+def certificate_path(name):
+    """مسار شهادة الاسم على القرص - تُنشأ فقط إذا لم تكن في الكاش"""
+    engine, cache = get_engine(), get_cache()
+    key = engine.cache_key(name)
+    path = cache.get(key)
+    if path is None:
+        path = cache.store(key, lambda f: engine.render_to(f, name))
+    return path
@@ -1,43 +1,559 @@
 #excel.py
-import pandas as pd
+import argparse
+import bisect
+import csv
+import hashlib
+import heapq
+import json
+import math
+import mmap
 import os
+import struct
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+REQUIRED_COLUMNS = ['Name', 'NationalID', 'Grade']
+STUDENTS_PATH = os.path.join(os.path.dirname(__file__), 'students.xlsx')
+STUDENTS_CSV_PATH = os.path.join(os.path.dirname(__file__), 'students.csv')
+# نسخة مُجمّعة من الملف (python excel.py compile) تُحمّل بدون pandas
+COMPILED_PATH = os.path.join(os.path.dirname(__file__), 'students.idx')
+
+# رأس الملف المجمّع: magic، نسخة الصيغة، عدد السجلات، طول قائمة الأعمدة
+_IDX_MAGIC = b'QRRS'
+_IDX_VERSION = 3
+_IDX_HEADER = struct.Struct('<4sHII')
+# بعد السجلات: مرشحا Bloom للأرقام القومية ثم لكلمات الأسماء (عدد البتات، عدد دوال التجزئة ثم البتات)،
+# ثم قسم الأسماء: عددها، إزاحاتها، رقم سجل أول ظهور لكل اسم، ثم الأسماء مرتبة
+_IDX_BLOOM = struct.Struct('<II')
+_IDX_COUNT = struct.Struct('<I')
+_KEY_SEP = '\x1f'
+
+
+# تشكيل + تطويل تُحذف، وصور الهمزة والتاء المربوطة والألف المقصورة تُوحّد
+_ARABIC_FOLD = {cp: None for cp in range(0x064B, 0x0660)}
+_ARABIC_FOLD.update({0x0670: None, 0x0640: None})
+_ARABIC_FOLD.update(str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و', 'ئ': 'ي', 'ى': 'ي', 'ة': 'ه',
+}))
+
+# أقل درجة تشابه لاعتبار اسم غير مطابق حرفياً مرشحاً (يحتاج تأكيداً بالرقم القومي)
+FUZZY_THRESHOLD = 0.85
+# عدد المرشحين من فهرس المقاطع الذين يُعاد تقييمهم بالمقارنة كلمة بكلمة، ومن هم دون هذه النسبة
+# من أفضل درجة Dice يُتركون
+FUZZY_CANDIDATES = 20
+FUZZY_DICE_RATIO = 0.75
+
+# نسبة الإيجابيات الكاذبة المقبولة في مرشح Bloom للأرقام القومية
+PREFILTER_ERROR_RATE = 0.01
+
+
+def normalize_name(name):
+    """توحيد الاسم للمقارنة: حروف عربية موحدة بدون تشكيل، حروف صغيرة، مسافات مفردة"""
+    return ' '.join(str(name).translate(_ARABIC_FOLD).lower().split())
+
+
+def _trigrams(key):
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _read_rows(path):
+    """قراءة صفوف ملف الطلاب (xlsx عبر pandas أو csv مباشرة)"""
+    if path.lower().endswith('.csv'):
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            return list(csv.DictReader(f))
+    import pandas as pd
+    return pd.read_excel(path).to_dict('records')
+
+
+class BloomFilter:
+    """مرشح Bloom: "غير موجود" مؤكدة، و"ربما موجود" تحتاج تأكيداً من الفهرس"""
+
+    def __init__(self, capacity, error_rate=PREFILTER_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def from_buffer(cls, size, hashes, bits):
+        """مرشح جاهز من بتات مخزنة (مثلاً memoryview على ملف mmap) بدون نسخ"""
+        bloom = cls.__new__(cls)
+        bloom.size, bloom.hashes, bloom._bits = size, hashes, bits
+        return bloom
+
+    def to_bytes(self):
+        return _IDX_BLOOM.pack(self.size, self.hashes) + bytes(self._bits)
+
+    def _hashes(self, key):
+        # تجزئة مزدوجة: قيمتان من blake2b تولّدان k موضعاً (h1 + i*h2)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        h1, h2 = self._hashes(key)
+        bits, size = self._bits, self.size
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class _RosterIndex:
+    """كل فهارس نسخة واحدة من الملف - تُستبدل كوحدة واحدة عند إعادة التحميل"""
+
+    def __init__(self, rows):
+        self.columns = set(rows[0]) if rows else set()
+        self.exact = {}
+        self.by_id = {}
+        self.names = []
+        self.by_name = {}
+        # كل كلمات الأسماء المسجلة - مرشح البحث بالاسم وحده
+        self.words = set()
+        self._grams = None
+        for row in rows:
+            key = normalize_name(row['Name'])
+            national_id = str(row.get('NationalID', '')).strip()
+            self.exact.setdefault((key, national_id), row)
+            self.by_id.setdefault(national_id, []).append((key, row))
+            if key not in self.by_name:
+                self.by_name[key] = len(self.names)
+                self.names.append((key, row))
+                self.words.update(key.split())
+
+    def __len__(self):
+        return len(self.exact)
+
+    @property
+    def ids(self):
+        """الفهرس في الذاكرة يعرف كل الأرقام فيكفيه مرشح دقيق بلا تكلفة إضافية"""
+        return self.by_id.keys()
+
+    def get(self, key, national_id):
+        return self.exact.get((key, national_id))
+
+    def find(self, key):
+        i = self.by_name.get(key)
+        return self.names[i][1] if i is not None else None
+
+    def candidates(self, national_id):
+        return self.by_id.get(national_id, ())
+
+    def _gram_index(self):
+        """فهرس المقاطع الثلاثية يُبنى عند أول بحث تقريبي فقط"""
+        if self._grams is None:
+            sizes, postings = [], {}
+            for i, (key, _) in enumerate(self.names):
+                grams = _trigrams(key)
+                sizes.append(len(grams))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(i)
+            self._grams = (sizes, postings)
+        return self._grams
+
+    def search(self, key):
+        """أفضل اسم - يُرجع (row, score)
+
+        فهرس المقاطع يختار المرشحين فقط، والدرجة النهائية من similarity التي تراعي ترتيب الكلمات.
+        """
+        if key in self.by_name:
+            return self.names[self.by_name[key]][1], 1.0
+        sizes, postings = self._gram_index()
+        grams = _trigrams(key)
+        overlap = {}
+        for gram in grams:
+            for i in postings.get(gram, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+        if not overlap:
+            return None, 0.0
+        dice = {i: 2 * count / (len(grams) + sizes[i]) for i, count in overlap.items()}
+        shortlist = heapq.nlargest(FUZZY_CANDIDATES, dice, key=dice.get)
+        # المرشحون بعيدون جداً عن الأفضل بالمقاطع لا يُعاد تقييمهم
+        cutoff = dice[shortlist[0]] * FUZZY_DICE_RATIO
+        words = len(key.split())
+        score, best = 0.0, shortlist[0]
+        for i in shortlist:
+            if dice[i] < cutoff:
+                break
+            candidate = self.names[i][0]
+            # حد أعلى مجاني: فرق عدد الكلمات وحده يمنع تجاوز الأفضل حتى الآن
+            count = len(candidate.split())
+            if min(words, count) / max(words, count) <= score:
+                continue
+            current = similarity(key, candidate)
+            if current > score:
+                score, best = current, i
+        return self.names[best][1], score
+
+
+class _CompiledIndex:
+    """فهرس مُجمّع على القرص عبر mmap: بحث ثنائي في مفاتيح مرتبة بدون تحليل أي صف مسبقاً
+
+    الاسم المطابق (find) ومرشح الكلمات يُقرآن من الملف مباشرة، والبحث التقريبي وحده يحتاج
+    كل الأسماء فيُبنى له _RosterIndex عند أول استخدام فقط.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, columns_len = _IDX_HEADER.unpack_from(self._mm, 0)
+        if magic != _IDX_MAGIC or version != _IDX_VERSION:
+            raise ValueError("invalid compiled roster (أعد تشغيل: python excel.py compile)")
+        start = _IDX_HEADER.size
+        self.columns = set(json.loads(self._mm[start:start + columns_len]))
+        table = start + columns_len
+        self._data = table + (self._count + 1) * 4
+        # الإزاحات مكتوبة little-endian وتُقرأ مباشرة من الذاكرة بدون نسخ
+        self._offsets = memoryview(self._mm)[table:self._data].cast('I')
+        self.ids, position = self._bloom(self._data + self._offsets[self._count])
+        self.words, position = self._bloom(position)
+        (self._name_count,) = _IDX_COUNT.unpack_from(self._mm, position)
+        table = position + _IDX_COUNT.size
+        rows = table + (self._name_count + 1) * 4
+        self._names = rows + self._name_count * 4
+        self._name_offsets = memoryview(self._mm)[table:rows].cast('I')
+        self._name_rows = memoryview(self._mm)[rows:self._names].cast('I')
+        self._full = None
+        self._full_lock = threading.Lock()
+
+    def _bloom(self, position):
+        size, hashes = _IDX_BLOOM.unpack_from(self._mm, position)
+        bits = position + _IDX_BLOOM.size
+        end = bits + (size + 7) // 8
+        return BloomFilter.from_buffer(size, hashes, memoryview(self._mm)[bits:end]), end
+
+    def __len__(self):
+        return self._count
+
+    def _name(self, i):
+        return self._mm[self._names + self._name_offsets[i]:self._names + self._name_offsets[i + 1]]
+
+    def _record(self, i):
+        raw = self._mm[self._data + self._offsets[i]:self._data + self._offsets[i + 1]]
+        key, _, row = raw.partition(b'\x00')
+        return key, row
+
+    def _key(self, i):
+        start = self._data + self._offsets[i]
+        return self._mm[start:self._mm.find(b'\x00', start)]
+
+    def get(self, key, national_id):
+        target = f"{key}{_KEY_SEP}{national_id}".encode('utf-8')
+        i = bisect.bisect_left(_KeyView(self._key, self._count), target)
+        if i < self._count and self._key(i) == target:
+            return json.loads(self._record(i)[1])
+        return None
+
+    def find(self, key):
+        """الصف الأول بهذا الاسم الموحد - بحث ثنائي في قسم الأسماء بدون تحليل باقي الصفوف"""
+        target = key.encode('utf-8')
+        i = bisect.bisect_left(_KeyView(self._name, self._name_count), target)
+        if i < self._name_count and self._name(i) == target:
+            return json.loads(self._record(self._name_rows[i])[1])
+        return None
+
+    def _full_index(self):
+        with self._full_lock:
+            if self._full is None:
+                self._full = _RosterIndex([json.loads(self._record(i)[1]) for i in range(self._count)])
+            return self._full
+
+    def candidates(self, national_id):
+        return self._full_index().candidates(national_id)
+
+    def search(self, key):
+        return self._full_index().search(key)
+
+
+class _KeyView:
+    """واجهة تسلسل للمفاتيح حتى يعمل bisect مباشرة على الـ mmap"""
+
+    def __init__(self, key, count):
+        self._key = key
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._key(i)
+
+
+def compile_roster(source, target):
+    """تجميع ملف الطلاب إلى صيغة ثنائية مرتبة قابلة للـ mmap (كتابة ذرية)"""
+    rows = _read_rows(source)
+    columns = list(rows[0]) if rows else []
+    unique, first, words = {}, {}, set()
+    ids = BloomFilter(len(rows))
+    for row in rows:
+        national_id = str(row.get('NationalID', '')).strip()
+        ids.add(national_id)
+        name = normalize_name(row['Name'])
+        key = f"{name}{_KEY_SEP}{national_id}".encode('utf-8')
+        unique.setdefault(key, json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+        # نفس اختيار _RosterIndex.by_name: أول صف بالاسم في الملف
+        if name not in first:
+            first[name] = key
+            words.update(name.split())
+    records = sorted(unique.items())
+    record_index = {key: i for i, (key, _) in enumerate(records)}
+    names = sorted((name.encode('utf-8'), record_index[key]) for name, key in first.items())
+    word_filter = BloomFilter(len(words))
+    for word in words:
+        word_filter.add(word)
+    name_offsets, position = [0], 0
+    for name, _ in names:
+        position += len(name)
+        name_offsets.append(position)
+    blobs, offsets, position = [], [0], 0
+    for key, row in records:
+        blob = key + b'\x00' + row
+        blobs.append(blob)
+        position += len(blob)
+        offsets.append(position)
+    columns_json = json.dumps(columns, ensure_ascii=False).encode('utf-8')
+    tmp = f"{target}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_IDX_HEADER.pack(_IDX_MAGIC, _IDX_VERSION, len(records), len(columns_json)))
+        f.write(columns_json)
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.writelines(blobs)
+        f.write(ids.to_bytes())
+        f.write(word_filter.to_bytes())
+        f.write(_IDX_COUNT.pack(len(names)))
+        f.write(struct.pack(f'<{len(name_offsets)}I', *name_offsets))
+        f.write(struct.pack(f'<{len(names)}I', *(row for _, row in names)))
+        f.writelines(name for name, _ in names)
+    os.replace(tmp, target)
+    return len(records)
+
+
+def similarity(a, b):
+    """تشابه اسمين موحدين كلمة بكلمة بنفس الترتيب
+
+    كل كلمة تُقارن بالكلمة في نفس موضعها، والقسمة على عدد كلمات الاسم الأطول،
+    فتبديل الترتيب أو نقص كلمة أو تكرارها يخفض الدرجة بدلاً من تجاهله.
+    """
+    ta, tb = a.split(), b.split()
+    if not ta or not tb:
+        return 1.0 if ta == tb else 0.0
+    total = sum(_word_similarity(x, y) for x, y in zip(ta, tb))
+    return total / max(len(ta), len(tb))
+
+
+@lru_cache(maxsize=65536)
+def _word_similarity(a, b):
+    """تشابه كلمتين - الكلمات الشائعة في الأسماء تتكرر كثيراً فتُحفظ النتائج"""
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class Roster:
+    """فهرس الطلاب في الذاكرة: يُقرأ الملف مرة واحدة ويُعاد تحميله عند تغيّر mtime
+
+    مع source (ملف المصدر لنسخة .idx) يُراقب mtime المصدر أيضاً، فتعديله بعد التجميع لا يُتجاهل.
+    """
+
+    def __init__(self, path, source=None):
+        self.path = path
+        # ملف المصدر للنسخة المجمّعة: إن كان أحدث منها يُقرأ هو حتى يُعاد التجميع
+        self.source = source if source != path else None
+        self._loaded = None
+        self._index = _RosterIndex([])
+        self._lock = threading.Lock()
+        # المرشح يرفض رقماً غير مسجل أو اسماً بلا أي كلمة مسجلة قبل أي بحث،
+        # والباقي يؤكده الفهرس أو يتضح أنه إيجابي كاذب
+        self.prefilter_rejects = 0
+        self.prefilter_passes = 0
+        self.confirmed_hits = 0
+
+    def _current(self):
+        """(المسار، mtime) للملف الذي يُقرأ: المجمّع ما لم يُعدّل المصدر بعد تجميعه"""
+        mtime = os.stat(self.path).st_mtime_ns
+        if self.source:
+            try:
+                source_mtime = os.stat(self.source).st_mtime_ns
+            except FileNotFoundError:
+                return self.path, mtime
+            if source_mtime > mtime:
+                return self.source, source_mtime
+        return self.path, mtime
+
+    def _ensure_loaded(self):
+        current = self._current()
+        if current == self._loaded:
+            return self._index
+        with self._lock:
+            if current != self._loaded:
+                path = current[0]
+                if path.endswith('.idx'):
+                    self._index = _CompiledIndex(path)
+                else:
+                    if path != self.path:
+                        print(f"⚠️ {path} أحدث من {self.path} - قراءة المصدر مباشرة"
+                              f" (أعد تشغيل: python excel.py compile)")
+                    rows = _read_rows(path)
+                    if rows and 'Name' not in rows[0]:
+                        raise ValueError("missing Name column")
+                    self._index = _RosterIndex(rows)
+                self._loaded = current
+            return self._index
+
+    def __len__(self):
+        return len(self._ensure_loaded())
+
+    @property
+    def columns(self):
+        return self._ensure_loaded().columns
+
+    def lookup(self, name, national_id):
+        """بحث O(1) بالاسم الموحد والرقم القومي - يُرجع الصف أو None"""
+        return self._ensure_loaded().get(normalize_name(name), str(national_id).strip())
+
+    def match(self, name, national_id=None, threshold=FUZZY_THRESHOLD):
+        """أفضل تطابق مع درجة التشابه - يُرجع (row, score) أو (None, score)
+
+        مع الرقم القومي تُقارن الأسماء المسجلة بهذا الرقم فقط، وبدونه يُبحث في فهرس المقاطع
+        بشرط أن تكون كلمة واحدة على الأقل من الاسم مسجلة (الاسم المطابق يمر دائماً).
+        """
+        index = self._ensure_loaded()
+        key = normalize_name(name)
+        if national_id is not None:
+            national_id = str(national_id).strip()
+            if national_id not in index.ids:
+                self.prefilter_rejects += 1
+                return None, 0.0
+            self.prefilter_passes += 1
+            row = index.get(key, national_id)
+            if row is not None:
+                self.confirmed_hits += 1
+                return row, 1.0
+            scored = [(similarity(key, candidate), row) for candidate, row in index.candidates(national_id)]
+            score, row = max(scored, key=lambda pair: pair[0], default=(0.0, None))
+            if score >= threshold:
+                self.confirmed_hits += 1
+        else:
+            if not any(word in index.words for word in key.split()):
+                self.prefilter_rejects += 1
+                return None, 0.0
+            self.prefilter_passes += 1
+            row = index.find(key)
+            if row is not None:
+                score = 1.0
+            else:
+                row, score = index.search(key)
+            if score >= threshold:
+                self.confirmed_hits += 1
+        return (row, score) if score >= threshold else (None, score)
+
+    def stats(self):
+        return {
+            "prefilter_rejects": self.prefilter_rejects,
+            "prefilter_passes": self.prefilter_passes,
+            "confirmed_hits": self.confirmed_hits,
+        }
+
+
+def _default_roster_path(paths=(COMPILED_PATH, STUDENTS_PATH, STUDENTS_CSV_PATH)):
+    """أول ملف موجود: النسخة المجمّعة ثم students.xlsx ثم students.csv"""
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    return STUDENTS_PATH
+
+
+roster = Roster(_default_roster_path(), source=_default_roster_path((STUDENTS_PATH, STUDENTS_CSV_PATH)))
+
+
+def _match_result(student, score):
+    if student is not None:
+        return {
+            "status": "accepted",
+            "name": student['Name'],
+            "grade": student.get('Grade'),
+            "score": round(score, 3)
+        }
+    else:
+        return {
+            "status": "rejected",
+            "message": "الطالب غير مسجل"
+        }
+
 
 def check_student(name, national_id):
     try:
-        excel_path = os.path.join(os.path.dirname(__file__), 'students.xlsx')
-        if not os.path.exists(excel_path):
+        if not os.path.exists(roster.path):
             return {
                 "status": "error",
                 "message": "ملف الطلاب غير موجود"
             }
-            
-        df = pd.read_excel(excel_path)
-        
-        required_columns = ['Name', 'NationalID', 'Grade']
-        if not all(col in df.columns for col in required_columns):
+
+        if not all(col in roster.columns for col in REQUIRED_COLUMNS):
             return {
                 "status": "error",
                 "message": "هيكل ملف الطلاب غير صحيح"
             }
-            
-        result = df[(df['Name'].str.strip().str.lower() == name.strip().lower()) & 
-                   (df['NationalID'].astype(str) == str(national_id))]
-        
-        if not result.empty:
-            student = result.iloc[0]
+
+        return _match_result(*roster.match(name, national_id))
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"حدث خطأ: {str(e)}"
+        }
+
+
+def find_student(name, national_id=None):
+    """البحث بالاسم (نموذج الشهادة)
+
+    الاسم وحده يُقبل فقط إذا طابق اسماً مسجلاً بعد التوحيد. الاسم القريب لا يُصدر شهادة
+    ولا يُكشف صاحبه، بل يُطلب الرقم القومي (إن وُجد عمود له) ليُقارن بالأسماء المسجلة به فقط.
+    """
+    try:
+        if not os.path.exists(roster.path):
             return {
-                "status": "accepted",
-                "name": student['Name'],
-                "grade": student['Grade']
+                "status": "error",
+                "message": "ملف الطلاب غير موجود"
             }
-        else:
+        if national_id:
+            return _match_result(*roster.match(name, national_id))
+        student, score = roster.match(name)
+        if student is not None and score < 1.0:
+            if 'NationalID' not in roster.columns:
+                return {
+                    "status": "rejected",
+                    "message": "الاسم غير مطابق تماماً - برجاء إدخاله كما في استمارة التسجيل"
+                }
             return {
-                "status": "rejected",
-                "message": "الطالب غير مسجل"
+                "status": "needs_id",
+                "message": "الاسم غير مطابق تماماً - أدخل الرقم القومي للتأكيد"
             }
-            
+        return _match_result(student, score)
+
     except Exception as e:
         return {
             "status": "error",
             "message": f"حدث خطأ: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="أدوات ملف الطلاب")
+    sub = parser.add_subparsers(dest='command', required=True)
+    compile_cmd = sub.add_parser('compile', help="تجميع ملف الطلاب إلى students.idx")
+    compile_cmd.add_argument('source', nargs='?', default=_default_roster_path((STUDENTS_PATH, STUDENTS_CSV_PATH)),
+                             help="الافتراضي: students.xlsx أو students.csv (أول الموجود)")
+    compile_cmd.add_argument('target', nargs='?', default=COMPILED_PATH)
+    args = parser.parse_args()
+    count = compile_roster(args.source, args.target)
+    print(f"✅ تم تجميع {count} طالب إلى {args.target}")
@@ -0,0 +1,135 @@
+#jobs.py
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# مدة بقاء المهمة المنتهية في الذاكرة (ثوانٍ) - تكفي لتحميل الشهادة بعد انتهائها
+FINISHED_TTL = 3600
+
+
+# ========== تخزين حالة المهام ==========
+class MemoryBackend:
+    """حالة المهام في الذاكرة - تكفي لعملية واحدة
+
+    المهام المنتهية تُحذف بعد ttl ثانية حتى لا تكبر الذاكرة مع كل شهادة طوال عمر العملية.
+    """
+
+    def __init__(self, ttl=FINISHED_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        # (وقت الانتهاء، id) بترتيب الانتهاء = ترتيب انقضاء المدة، فالحذف من البداية فقط
+        self._finished = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        while self._finished and self._finished[0][0] <= deadline:
+            self._jobs.pop(self._finished.popleft()[1], None)
+
+    def create(self, job_id, name):
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = {"id": job_id, "name": name, "status": QUEUED,
+                                  "path": None, "error": None, "created_at": time.time()}
+
+    def update(self, job_id, status, path=None, error=None):
+        with self._lock:
+            self._jobs[job_id].update(status=status, path=path, error=error)
+            if status in (DONE, FAILED):
+                self._finished.append((time.monotonic(), job_id))
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SQLiteBackend:
+    """حالة المهام في SQLite محلي - تبقى بعد إعادة التشغيل وتُشارك بين عمليات نفس الجهاز"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, name TEXT, status TEXT,
+                path TEXT, error TEXT, created_at REAL)""")
+
+    def _connect(self):
+        if not hasattr(self._local, 'db'):
+            self._local.db = sqlite3.connect(self.path, timeout=10)
+            self._local.db.row_factory = sqlite3.Row
+        return self._local.db
+
+    def create(self, job_id, name):
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs VALUES (?, ?, ?, NULL, NULL, ?)", (job_id, name, QUEUED, time.time()))
+
+    def update(self, job_id, status, path=None, error=None):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = ?, path = ?, error = ? WHERE id = ?", (status, path, error, job_id))
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+
+# ========== الطابور ==========
+class JobQueue:
+    """طابور مهام داخل العملية: الطلب يُرجع id فوراً والتنفيذ في مجموعة خيوط"""
+
+    def __init__(self, handler, backend=None, workers=2):
+        self.handler = handler
+        self.backend = backend or MemoryBackend()
+        self.completed = 0
+        self.failed = 0
+        self._pending = 0
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+
+    def submit(self, name):
+        job_id = uuid.uuid4().hex
+        self.backend.create(job_id, name)
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, job_id, name, time.perf_counter())
+        return job_id
+
+    def _run(self, job_id, name, queued_at):
+        self.backend.update(job_id, RUNNING)
+        try:
+            path = self.handler(name)
+        except Exception as e:
+            print(f"❌ فشل إنشاء الشهادة ({job_id}): {e}")
+            self.backend.update(job_id, FAILED, error=str(e))
+            with self._lock:
+                self._pending -= 1
+                self.failed += 1
+            return
+        self.backend.update(job_id, DONE, path=path)
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+            self._latencies.append(time.perf_counter() - queued_at)
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies) or [0.0]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return {
+            "depth": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_avg_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "latency_p95_ms": round(p95 * 1000, 2),
+        }
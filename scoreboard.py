@@ -0,0 +1,342 @@
+#scoreboard.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from functools import cached_property
+
+DEFAULT_MVP = {"name": "", "team": "", "score": 0}
+
+# ثلاث استعلامات متوازية = رحلة واحدة إلى Supabase بدلاً من ثلاث متتالية
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="snapshot")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """لقطة كاملة لبيانات لوحة النتائج"""
+    teams: list = field(default_factory=list)
+    mvp: dict = field(default_factory=lambda: dict(DEFAULT_MVP))
+    news_items: list = field(default_factory=list)
+    news_ids: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {"teams": self.teams, "mvp": self.mvp, "news_items": self.news_items}
+
+    @cached_property
+    def ranked(self):
+        """الفرق مرتبة بالنقاط مع rank - تُحسب مرة واحدة لكل لقطة (أي لكل إصدار)
+
+        نسخ منفصلة عن teams حتى لا يصل rank إلى الحفظ في Supabase.
+        """
+        ordered = sorted(self.teams, key=lambda team: team.get('score') or 0, reverse=True)
+        return [dict(team, rank=index + 1) for index, team in enumerate(ordered)]
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(teams=data.get('teams') or [], mvp=data.get('mvp') or dict(DEFAULT_MVP),
+                   news_items=data.get('news_items') or [])
+
+
+def _fetch_teams(client):
+    return client.table('teams').select('*').execute().data
+
+
+def _fetch_mvp(client):
+    rows = client.table('mvp').select('*').limit(1).execute().data
+    return rows[0] if rows else dict(DEFAULT_MVP)
+
+
+def _fetch_news(client):
+    return client.table('news_items').select('id, text').order('created_at', desc=False).execute().data
+
+
+def fetch_snapshot(client):
+    """جلب الجداول الثلاثة بالتوازي وإرجاع Snapshot (الأخطاء تُرفع للمستدعي)"""
+    teams = _executor.submit(_fetch_teams, client)
+    mvp = _executor.submit(_fetch_mvp, client)
+    news = _executor.submit(_fetch_news, client)
+    news_rows = news.result()
+    return Snapshot(teams=teams.result(), mvp=mvp.result(),
+                    news_items=[item['text'] for item in news_rows],
+                    news_ids=[item['id'] for item in news_rows])
+
+
+def snapshot_delta(old, new):
+    """التغييرات من old إلى new للعميل (فرق مرتبة متغيرة، ids محذوفة، MVP، أخبار جديدة)
+
+    يُرجع None إذا تعذر التعبير عن الفرق (فرق بدون id مثل لقطة القرص) فيُرسل العميل اللقطة كاملة.
+    """
+    if any('id' not in team for team in old.teams + new.teams):
+        return None
+    before = {team['id']: team for team in old.ranked}
+    delta = {
+        "teams": [team for team in new.ranked if before.get(team['id']) != team],
+        "removed": sorted(set(before) - {team['id'] for team in new.teams}),
+    }
+    if new.mvp != old.mvp:
+        delta["mvp"] = new.mvp
+    count = len(old.news_items)
+    if new.news_items[:count] == old.news_items:
+        delta["news_added"] = new.news_items[count:]
+    else:
+        delta["news_items"] = new.news_items
+    return delta
+
+
+# ========== الحفظ بالفرق ==========
+def payload_digest(data):
+    """بصمة ثابتة لمحتوى الحفظ (بدون رقم المراجعة) لاكتشاف الحفظ المكرر"""
+    content = {k: data.get(k) for k in ('teams', 'mvp', 'news_items')}
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+
+def _diff_teams(current, teams):
+    """الفرق المطلوب في الفرق: (صفوف للتحديث، صفوف جديدة، ids للحذف)"""
+    existing = {team['id']: team for team in current.teams}
+    upserts, inserts, kept = [], [], set()
+    for team in teams:
+        old = existing.get(team.get('id'))
+        if old is None:
+            inserts.append({k: v for k, v in team.items() if k != 'id'})
+            continue
+        kept.add(old['id'])
+        if any(old.get(k) != v for k, v in team.items()):
+            upserts.append(team)
+    deletes = [team_id for team_id in existing if team_id not in kept]
+    return upserts, inserts, deletes
+
+
+def _diff_news(current, news_items):
+    """الفرق في الأخبار بمطابقة التسلسل: (تعديلات، نصوص جديدة، ids للحذف)"""
+    upserts, inserts, deletes = [], [], []
+    matcher = SequenceMatcher(None, current.news_items, news_items, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        for k in range(paired):
+            upserts.append({"id": current.news_ids[i1 + k], "text": news_items[j1 + k]})
+        deletes.extend(current.news_ids[i1 + paired:i2])
+        inserts.extend({"text": text} for text in news_items[j1 + paired:j2])
+    return upserts, inserts, deletes
+
+
+def save_snapshot(client, current, data):
+    """حفظ الفرق فقط: upsert واحد + insert واحد + delete واحد لكل جدول كحد أقصى
+
+    لا يوجد حذف شامل، فالقارئ لا يرى الجداول فارغة أثناء الحفظ.
+    يُرجع Snapshot بالبيانات المحفوظة (مع ids للفرق الجديدة).
+    """
+    teams = data.get('teams') or []
+    news_items = data.get('news_items') or []
+    team_upserts, team_inserts, team_deletes = _diff_teams(current, teams)
+    news_upserts, news_inserts, news_deletes = _diff_news(current, news_items)
+
+    inserted = []
+    if team_upserts:
+        client.table('teams').upsert(team_upserts).execute()
+    if team_inserts:
+        inserted = client.table('teams').insert(team_inserts).execute().data
+
+    mvp = data.get('mvp') or {}
+    mvp_id = current.mvp.get('id')
+    if mvp and any(current.mvp.get(k) != v for k, v in mvp.items()):
+        if mvp_id is not None:
+            client.table('mvp').upsert(dict(mvp, id=mvp_id)).execute()
+        else:
+            client.table('mvp').insert(mvp).execute()
+    elif not mvp and mvp_id is not None:
+        client.table('mvp').delete().eq('id', mvp_id).execute()
+
+    if news_upserts:
+        client.table('news_items').upsert(news_upserts).execute()
+    if news_inserts:
+        client.table('news_items').insert(news_inserts).execute()
+
+    if team_deletes:
+        client.table('teams').delete().in_('id', team_deletes).execute()
+    if news_deletes:
+        client.table('news_items').delete().in_('id', news_deletes).execute()
+
+    print(f"💾 الفرق: {len(team_upserts)} تعديل، {len(team_inserts)} إضافة، {len(team_deletes)} حذف | "
+          f"الأخبار: {len(news_upserts)} تعديل، {len(news_inserts)} إضافة، {len(news_deletes)} حذف")
+
+    existing_ids = {team['id'] for team in current.teams}
+    new_rows = iter(inserted)
+    saved_teams = [team if team.get('id') in existing_ids else next(new_rows, team) for team in teams]
+    return Snapshot(teams=saved_teams, mvp=mvp or dict(DEFAULT_MVP), news_items=list(news_items))
+
+
+# ========== كاش اللقطة ==========
+class SnapshotCache:
+    """كاش داخل العملية بمدة صلاحية ورقم إصدار يزيد مع كل تغيير في المحتوى
+
+    بعد انتهاء الصلاحية تُرجع النسخة السابقة فوراً ويُعاد الجلب في الخلفية (stale-while-revalidate).
+    مع path تُحفظ آخر لقطة ناجحة على القرص وتُستخدم عند التشغيل البارد، ومع seed (ملف للقراءة فقط)
+    تُستخدم بديلاً إذا لم يوجد path بعد (نسخة جديدة على Vercel)، فلا ينتظر أي طلب Supabase إلا
+    بدون أي منهما. فشل ذلك الجلب يُخزّن لقطة فارغة لمدة error_backoff بدلاً من إعادة المحاولة
+    لكل طلب منتظر، ثم يُعاد الجلب في الخلفية.
+    """
+
+    def __init__(self, loader, ttl=5.0, path=None, history=32, seed=None, error_backoff=2.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.path = path
+        self.seed = seed
+        self.error_backoff = error_backoff
+        # الإصدارات تبدأ من الصفر مع كل عملية، فالـ epoch يميّز إصدارات هذه العملية عن غيرها
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._snapshot = None
+        self._expires_at = None
+        self._refreshing = False
+        # يزيد مع كل إبطال حتى لا يُعتبر جلب بدأ قبل الحفظ نسخة حديثة
+        self._generation = 0
+        # سجل محدود لآخر اللقطات بإصداراتها لحساب الفرق لـ ?since=
+        self._history = deque(maxlen=history)
+        self._cond = threading.Condition()
+
+    def get(self):
+        """إرجاع (snapshot, version) - لا ينتظر المصدر إلا إذا لم توجد أي نسخة سابقة"""
+        with self._cond:
+            if self._expires_at is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._snapshot, self.version
+            if self._snapshot is None and (self.path or self.seed):
+                self._load_disk()
+            if self._snapshot is not None:
+                self.stale_hits += 1
+                self._start_refresh()
+                return self._snapshot, self.version
+            self.misses += 1
+            try:
+                self._store(self.loader())
+            except Exception as e:
+                # الطلبات المنتظرة على القفل تأخذ اللقطة الفارغة بدلاً من انتظار مهلة Supabase واحداً تلو الآخر
+                print(f"⚠️ تعذر جلب اللقطة - لقطة فارغة لمدة {self.error_backoff}ث: {e}")
+                self.refresh_errors += 1
+                self._store(Snapshot(), persist=False)
+                self._expires_at = time.monotonic() + self.error_backoff
+            return self._snapshot, self.version
+
+    def _store(self, snapshot, persist=True):
+        if snapshot != self._snapshot:
+            self.version += 1
+            self._history.append((self.version, snapshot))
+            self._cond.notify_all()
+            if persist:
+                self._persist(snapshot)
+        self._snapshot = snapshot
+        self._expires_at = time.monotonic() + self.ttl
+
+    def _start_refresh(self):
+        if not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, args=(self._generation,),
+                             name="snapshot-refresh", daemon=True).start()
+
+    def _refresh(self, generation):
+        try:
+            snapshot = self.loader()
+        except Exception as e:
+            print(f"⚠️ تعذر تحديث اللقطة - الاستمرار بالنسخة السابقة: {e}")
+            with self._cond:
+                self.refresh_errors += 1
+                self._refreshing = False
+                # المحاولة التالية بعد مدة الصلاحية بدلاً من مع كل طلب
+                self._expires_at = time.monotonic() + self.ttl
+            return
+        with self._cond:
+            self.refreshes += 1
+            self._refreshing = False
+            self._store(snapshot)
+            if generation != self._generation:
+                self._expires_at = None
+                self._start_refresh()
+
+    def _load_disk(self):
+        """آخر لقطة محفوظة في path، وإلا نسخة seed - الـ seed لا يُكتب فوقه أبداً"""
+        snapshot = None
+        for path in (self.path, self.seed):
+            if not path:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshot = Snapshot.from_dict(json.load(f))
+                break
+            except (OSError, ValueError) as e:
+                print(f"⚠️ لا توجد لقطة محفوظة صالحة في {path}: {e}")
+        if snapshot is None:
+            return
+        self.version += 1
+        self._history.append((self.version, snapshot))
+        self._snapshot = snapshot
+        self._cond.notify_all()
+
+    def _persist(self, snapshot):
+        """كتابة ذرية لآخر لقطة (ملف مؤقت ثم استبدال) - الفشل لا يوقف الخدمة"""
+        if not self.path:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        except OSError as e:
+            print(f"⚠️ تعذر حفظ اللقطة في {self.path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot.to_dict(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            os.remove(tmp)
+            print(f"⚠️ تعذر حفظ اللقطة في {self.path}: {e}")
+
+    def at(self, version):
+        """اللقطة المحفوظة لإصدار سابق أو None إذا خرج من السجل"""
+        with self._cond:
+            for known, snapshot in self._history:
+                if known == version:
+                    return snapshot
+        return None
+
+    def invalidate(self):
+        """إبطال فوري بعد الحفظ - الجلب يبدأ في الخلفية والمشتركون يُبلّغون بالإصدار الجديد"""
+        with self._cond:
+            self._expires_at = None
+            self._generation += 1
+            self._cond.notify_all()
+            if self._snapshot is not None:
+                self._start_refresh()
+
+    def wait(self, timeout):
+        """انتظار إبطال أو إصدار جديد (لقنوات البث) - يعيد False عند انتهاء المهلة"""
+        with self._cond:
+            return self._cond.wait(timeout)
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "version": self.version,
+            "epoch": self.epoch,
+            "history": len(self._history),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -1,5 +1,5 @@
 class CompetitionDashboard {
-    constructor() { this.data = {}; this.chart = null; this.init(); }
+    constructor() { this.data = {}; this.etag = null; this.chart = null; this.init(); }
 
     async init() {
         await this.fetchData();
@@ -10,13 +10,36 @@ class CompetitionDashboard {
 
     async fetchData() {
         try {
-            const response = await fetch('/api/data');
-            this.data = await response.json();
+            const headers = this.etag ? { 'If-None-Match': this.etag } : {};
+            // بعد أول تحميل نطلب التغييرات فقط منذ آخر إصدار لدينا
+            const since = this.data.version != null
+                ? `?since=${this.data.version}&epoch=${this.data.epoch}` : '';
+            const response = await fetch('/api/data' + since, { headers, cache: 'no-store' });
+            if (response.status === 304) return false;
+            const payload = await response.json();
+            if (payload.delta) this.applyDelta(payload);
+            else this.data = payload;
+            this.etag = response.headers.get('ETag');
             this.sortTeams();
-        } catch (error) { console.error('Error:', error); }
+            return true;
+        } catch (error) { console.error('Error:', error); return false; }
+    }
+
+    applyDelta(delta) {
+        const teams = new Map(this.data.teams.map(team => [team.id, team]));
+        delta.removed.forEach(id => teams.delete(id));
+        delta.teams.forEach(team => teams.set(team.id, team));
+        this.data.teams = [...teams.values()].sort((a, b) => a.rank - b.rank);
+        if (delta.mvp) this.data.mvp = delta.mvp;
+        this.data.news_items = delta.news_items || this.data.news_items.concat(delta.news_added);
+        this.data.news = this.data.news_items;
+        this.data.version = delta.version;
+        this.data.epoch = delta.epoch;
     }
 
     sortTeams() {
+        // السيرفر يرسل الفرق مرتبة ومعها rank - الترتيب هنا للنسخ القديمة من السيرفر فقط
+        if (this.data.teams.length && this.data.teams[0].rank) return;
         this.data.teams.sort((a, b) => b.score - a.score);
         this.data.teams.forEach((team, index) => team.rank = index + 1);
     }
@@ -135,10 +158,25 @@ class CompetitionDashboard {
         setInterval(updateCountdown, 1000);
     }
 
-    async startAutoRefresh() {
-        setInterval(async () => {
-            await this.fetchData();
+    startAutoRefresh() {
+        if (!window.EventSource) return this.startPolling();
+        const source = new EventSource('/api/stream');
+        source.addEventListener('snapshot', (event) => {
+            if (event.lastEventId === this.etag) return;
+            this.data = JSON.parse(event.data);
+            this.etag = event.lastEventId;
+            this.sortTeams();
             this.renderAll();
+        });
+        source.onerror = () => {
+            // السيرفر لا يدعم البث (مثلاً على بيئة serverless) - الرجوع للاستطلاع
+            if (source.readyState === EventSource.CLOSED) this.startPolling();
+        };
+    }
+
+    startPolling() {
+        setInterval(async () => {
+            if (await this.fetchData()) this.renderAll();
         }, 15000);
     }
 }
@@ -0,0 +1,122 @@
+#tests/test_bootstrap.py
+"""فحص البيانات الافتراضية يعمل مرة واحدة لكل عملية - الطلبات بعده لا ترسل أي استعلام count"""
+import threading
+
+import pytest
+
+import app as app_module
+from scoreboard import SnapshotCache, fetch_snapshot
+
+
+class _Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, client, name):
+        self.client = client
+        self.rows = client.tables[name]
+        self.count = None
+
+    def select(self, *columns, count=None):
+        self.count = count
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.rows = self.rows[:n]
+        return self
+
+    def execute(self):
+        with self.client.lock:
+            self.client.queries += 1
+            if self.count is not None:
+                self.client.count_queries += 1
+        return _Response([dict(row) for row in self.rows],
+                         count=len(self.rows) if self.count is not None else None)
+
+
+class CountingSupabase:
+    """عميل وهمي للقراءة فقط يعدّ الاستعلامات واستعلامات count"""
+
+    def __init__(self):
+        self.tables = {
+            'teams': [{"id": 1, "name": "فريق 1", "score": 10, "members": 4, "ideas": 2}],
+            'mvp': [{"id": 1, "name": "لاعب", "team": "فريق 1", "score": 5}],
+            'news_items': [{"id": 1, "text": "خبر"}],
+        }
+        self.queries = 0
+        self.count_queries = 0
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+@pytest.fixture
+def fake(monkeypatch, tmp_path):
+    client = CountingSupabase()
+    monkeypatch.setattr(app_module, 'get_supabase', lambda: client)
+    monkeypatch.setattr(app_module, 'snapshot_cache',
+                        SnapshotCache(lambda: fetch_snapshot(client), ttl=60,
+                                      path=str(tmp_path / 'snapshot.json')))
+    monkeypatch.setattr(app_module, '_data_initialized', False)
+    monkeypatch.setattr(app_module, '_api_payload', (None, None, None))
+    monkeypatch.setattr(app_module, '_delta_payloads', (None, {}))
+    monkeypatch.setattr(app_module, '_leaderboard_payloads', (None, {}))
+    return client
+
+
+@pytest.fixture
+def client(fake):
+    return app_module.app.test_client()
+
+
+def test_static_pages_skip_bootstrap(fake, client):
+    assert client.get('/').status_code == 200
+    assert fake.queries == 0
+    assert not app_module._data_initialized
+
+
+def test_bootstrap_runs_once(fake, client):
+    assert client.get('/api/data').status_code == 200
+    assert fake.count_queries == 1
+    assert app_module._data_initialized
+
+    for path in ('/api/data', '/api/leaderboard', '/api/data', '/api/leaderboard?limit=1'):
+        assert client.get(path).status_code == 200
+    assert fake.count_queries == 1
+
+
+def test_concurrent_first_requests_bootstrap_once(fake):
+    barrier = threading.Barrier(8)
+    statuses = []
+
+    def first_request():
+        with app_module.app.test_client() as c:
+            barrier.wait()
+            statuses.append(c.get('/api/data').status_code)
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 8
+    assert fake.count_queries == 1
+
+
+def test_steady_state_makes_no_count_queries(fake, client):
+    client.get('/api/data')
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    before = fake.count_queries
+    for _ in range(5):
+        assert client.get('/api/data').status_code in (200, 304)
+        assert client.get('/api/leaderboard').status_code in (200, 304)
+        assert client.get('/admin/dashboard').status_code == 200
+    assert fake.count_queries == before
@@ -0,0 +1,18 @@
+#tests/test_import_time.py
+"""ميزانية زمن استيراد app.py (التشغيل البارد على Vercel) - نفس قياس python bench.py importtime"""
+import os
+import statistics
+
+import bench
+
+BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '400'))
+
+
+def test_heavy_libraries_are_deferred():
+    _, _, loaded = bench._import_profile('app')
+    assert [name for name in bench.DEFERRED_IMPORTS if name in loaded] == []
+
+
+def test_import_within_budget():
+    median = statistics.median(bench._import_profile('app')[0] for _ in range(3))
+    assert median <= BUDGET_MS, f"import app p50={median:.1f}ms > {BUDGET_MS:.0f}ms"
@@ -0,0 +1,49 @@
+#tests/test_snapshot_cache.py
+"""التشغيل البارد للقطة: فشل Supabase لا يتكرر لكل طلب، والنسخة المرفقة تُعرض بدون كتابة فوقها"""
+import json
+import threading
+import time
+
+from scoreboard import SnapshotCache
+
+
+def _failing_loader(calls, delay=0.2):
+    def loader():
+        calls.append(time.monotonic())
+        time.sleep(delay)
+        raise ConnectionError("supabase down")
+    return loader
+
+
+def test_failed_cold_miss_is_not_retried_by_waiters():
+    calls = []
+    cache = SnapshotCache(_failing_loader(calls), ttl=60, error_backoff=60)
+    latencies = []
+
+    def get():
+        start = time.perf_counter()
+        snapshot, _ = cache.get()
+        latencies.append(time.perf_counter() - start)
+        assert snapshot.teams == []
+
+    threads = [threading.Thread(target=get) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert max(latencies) < 0.4
+
+
+def test_seed_served_read_only_when_snapshot_file_missing(tmp_path):
+    seed = tmp_path / 'data.json'
+    seed.write_text(json.dumps({"teams": [{"name": "فريق", "score": 1}]}), encoding='utf-8')
+    before = seed.read_bytes()
+    calls = []
+    cache = SnapshotCache(_failing_loader(calls, delay=0), ttl=0, path=str(tmp_path / 'missing' / 'snap.json'),
+                          seed=str(seed))
+    snapshot, version = cache.get()
+    assert [team['name'] for team in snapshot.teams] == ["فريق"]
+    assert version == 1
+    time.sleep(0.05)
+    assert seed.read_bytes() == before
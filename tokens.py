@@ -0,0 +1,136 @@
+#tokens.py
+"""رموز QR الموقّعة على الشهادات - التحقق بـ HMAC فقط بدون قاعدة بيانات
+
+    python tokens.py issue "اسم الطالب"
+    python tokens.py verify scans.txt       # رمز أو رابط في كل سطر
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import sys
+import time
+
+from excel import normalize_name
+
+# المفتاح من البيئة فقط: مفتاح مولّد لكل نسخة كان يجعل رموز نسخة مرفوضة في أخرى (Vercel) أو بعد مسح /tmp
+SIGNING_KEY_ENV = 'CERT_SIGNING_KEY'
+# بادئة اختيارية تُوضع قبل الرمز في QR (مثلاً https://example.com/verify/) حتى يفتحه أي هاتف
+VERIFY_URL = os.environ.get('CERT_VERIFY_URL', '')
+
+# الرمز: معرف الطالب (8 بايت) + وقت الإصدار (4 بايت) + أول 10 بايت من HMAC-SHA256 = 30 حرف base64
+_PAYLOAD = struct.Struct('>8sI')
+_MAC_SIZE = 10
+TOKEN_LENGTH = 30
+
+_base_mac = None
+
+
+def signing_configured():
+    return bool(os.environ.get(SIGNING_KEY_ENV))
+
+
+def _load_key():
+    key = os.environ.get(SIGNING_KEY_ENV)
+    if not key:
+        raise RuntimeError(f"{SIGNING_KEY_ENV} غير مضبوط - لا يمكن إصدار رموز الشهادات أو التحقق منها")
+    return key.encode('utf-8')
+
+
+def _signer():
+    """HMAC مُهيّأ بالمفتاح مرة واحدة - كل توقيع ينسخه بدلاً من إعادة تهيئته"""
+    global _base_mac
+    if _base_mac is None:
+        _base_mac = hmac.new(_load_key(), digestmod=hashlib.sha256)
+    return _base_mac
+
+
+def key_fingerprint():
+    """بصمة قصيرة لمفتاح التوقيع (HMAC لنص ثابت) تتغير مع تدوير المفتاح ولا تكشفه"""
+    signer = _signer().copy()
+    signer.update(b'key-fingerprint')
+    return signer.hexdigest()[:16]
+
+
+def _mac(payload):
+    signer = _signer().copy()
+    signer.update(payload)
+    return signer.digest()[:_MAC_SIZE]
+
+
+def student_id(name):
+    """معرف ثابت وغير مقروء للطالب من اسمه الموحد"""
+    return hashlib.sha256(normalize_name(name).encode('utf-8')).digest()[:8]
+
+
+def issue_token(name, issued_at=None):
+    """رمز موقّع للطالب ووقت الإصدار"""
+    issued_at = int(time.time() if issued_at is None else issued_at)
+    payload = _PAYLOAD.pack(student_id(name), issued_at)
+    return base64.urlsafe_b64encode(payload + _mac(payload)).rstrip(b'=').decode('ascii')
+
+
+def qr_data(token):
+    return f"{VERIFY_URL}{token}"
+
+
+def verify_token(token):
+    """{"student_id", "issued_at"} للرمز الصحيح أو None - يقبل الرمز وحده أو رابط QR كاملاً
+
+    يرفع RuntimeError إذا لم يُضبط مفتاح التوقيع.
+    """
+    token = token.strip().rsplit('/', 1)[-1]
+    if len(token) != TOKEN_LENGTH:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '==')
+    except ValueError:
+        return None
+    # آخر حرف يحمل 4 بتات زائدة يتجاهلها فك الترميز - نقبل الصيغة القياسية وحدها لكل رمز
+    if base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii') != token:
+        return None
+    payload, mac = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+    if not hmac.compare_digest(mac, _mac(payload)):
+        return None
+    sid, issued_at = _PAYLOAD.unpack(payload)
+    return {"student_id": sid.hex(), "issued_at": issued_at}
+
+
+def verify_many(tokens):
+    """التحقق من دفعة رموز (بوابة المسح) - نتيجة لكل رمز بنفس الترتيب"""
+    return [verify_token(token) for token in tokens]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    issue_cmd = sub.add_parser('issue', help="إصدار رمز لاسم")
+    issue_cmd.add_argument('name')
+    verify_cmd = sub.add_parser('verify', help="التحقق من ملف رموز (- للإدخال القياسي)")
+    verify_cmd.add_argument('path')
+    args = parser.parse_args()
+    if not signing_configured():
+        parser.error(f"{SIGNING_KEY_ENV} غير مضبوط")
+
+    if args.command == 'issue':
+        print(qr_data(issue_token(args.name)))
+        return
+    source = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8')
+    with source:
+        tokens = [line for line in source if line.strip()]
+    start = time.perf_counter()
+    results = verify_many(tokens)
+    elapsed = time.perf_counter() - start
+    for token, result in zip(tokens, results):
+        if result is None:
+            print(f"invalid: {token.strip()}")
+    valid = sum(result is not None for result in results)
+    rate = len(tokens) / elapsed if elapsed else 0.0
+    print(f"✅ {valid}/{len(tokens)} صالحة ({rate:,.0f} رمز/ث)")
+    sys.exit(0 if valid == len(tokens) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#transport.py
+"""اتصال HTTP مشترك لكل طلبات Supabase مع عدادات إعادة استخدام الاتصالات
+
+httpx يُستورد هنا فقط، وهذه الوحدة لا تُستورد إلا مع أول وصول للبيانات (get_supabase).
+"""
+import importlib.util
+import os
+import threading
+
+import httpx
+
+# حدود المجموعة: عدد صغير يكفي (3 طلبات متوازية للقطة + الحفظ) بدون فتح اتصالات بلا حد
+POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', '10'))
+# الافتراضي في httpx خمس ثوانٍ = مدة كاش اللقطة، فكان كل تحديث يجد الاتصال مغلقاً ويعيد مصافحة TLS
+KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE', '60'))
+# مهلات لكل طلب بدلاً من 120 ثانية الافتراضية في postgrest
+TIMEOUT = httpx.Timeout(
+    connect=float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', '3')),
+    read=float(os.environ.get('SUPABASE_READ_TIMEOUT', '10')),
+    write=10.0,
+    pool=5.0,
+)
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """HTTPTransport يعدّ الطلبات والاتصالات الجديدة عبر trace الخاص بـ httpcore"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _trace(self, event, info):
+        if event == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+        elif event == 'connection.start_tls.complete':
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def handle_request(self, request):
+        outer = request.extensions.get('trace')
+        if outer is None:
+            request.extensions['trace'] = self._trace
+        else:
+            def trace(event, info):
+                self._trace(event, info)
+                outer(event, info)
+            request.extensions['trace'] = trace
+        try:
+            response = super().handle_request(request)
+        except httpx.TransportError:
+            with self._lock:
+                self.errors += 1
+            raise
+        with self._lock:
+            self.requests += 1
+            if response.extensions.get('http_version') == b'HTTP/2':
+                self.http2_requests += 1
+        return response
+
+    def stats(self):
+        with self._lock:
+            requests, connections = self.requests, self.connections
+            return {
+                "requests": requests,
+                "connections": connections,
+                "tls_handshakes": self.tls_handshakes,
+                "http2_requests": self.http2_requests,
+                "errors": self.errors,
+                "reuse_rate": round(1 - connections / requests, 4) if requests else 0.0,
+            }
+
+
+def create_transport(verify=True):
+    """MeteredTransport بإعدادات المجموعة: keep-alive وHTTP/2 (إن توفرت h2) وحدود الاتصالات
+
+    يحتفظ المستدعي بمرجع له لقراءة stats() بدلاً من الوصول لخصائص httpx.Client الداخلية.
+    """
+    return MeteredTransport(
+        verify=verify,
+        http2=importlib.util.find_spec('h2') is not None,
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+        # إعادة محاولة واحدة لفشل الاتصال فقط (قبل إرسال أي بيانات) - آمنة حتى مع الكتابة
+        retries=1,
+    )
+
+
+def create_http_client(transport):
+    """عميل httpx مشترك فوق transport بمهلات الطلب - يُمرر لـ create_client"""
+    return httpx.Client(transport=transport, timeout=TIMEOUT, follow_redirects=True)